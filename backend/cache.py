@@ -0,0 +1,229 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import contextmanager
+
+# ======================================================
+# CONTENT-ADDRESSED UPLOADS + RESULT CACHE
+# ======================================================
+# Uploads are stored as uploads/<sha256><ext>, so the same clip is kept once
+# and two different clips with the same name never collide. Finished runs
+# are indexed by a key over (video hash, every process_video option that can
+# change the output, the processing constants and the zone config contents);
+# a repeat request returns the existing history/<run_id> at once.
+#
+# Cached runs and uploads are evicted least-recently-used first once their
+# total size passes TRAFFIC_CACHE_MAX_MB. Only runs recorded here are ever
+# deleted, and callers can pin paths still in use (e.g. queued jobs).
+
+UPLOAD_DIR = "uploads"
+CACHE_DB = "cache.db"
+CACHE_VERSION = 5               # bump when processing changes its output
+MAX_CACHE_BYTES = int(os.environ.get("TRAFFIC_CACHE_MAX_MB", "5120")) * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+# process_video options that do not change traffic_log.csv / summary.json
+_IGNORED_OPTIONS = {
+    "video_path", "batch_size", "batch_latency_ms", "pipelined", "queue_size",
+    "progress", "stop_event", "max_duration_s",
+}
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS uploads (
+        hash TEXT PRIMARY KEY,
+        path TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        last_used REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS runs (
+        key TEXT PRIMARY KEY,
+        video_hash TEXT NOT NULL,
+        run_dir TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        last_used REAL NOT NULL
+    )""",
+)
+
+_HASHES = {}                    # (path, size, mtime) -> sha256
+
+
+@contextmanager
+def _connect(path=CACHE_DB):
+    db = sqlite3.connect(path, timeout=30, isolation_level=None)
+    db.row_factory = sqlite3.Row
+    try:
+        for stmt in _SCHEMA:
+            db.execute(stmt)
+        yield db
+    finally:
+        db.close()
+
+
+def _dir_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+# ======================================================
+# UPLOADS
+# ======================================================
+def hash_file(path):
+    """sha256 of a file's contents, memoised on (path, size, mtime)."""
+    stat = os.stat(path)
+    memo = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    digest = _HASHES.get(memo)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+        digest = _HASHES[memo] = h.hexdigest()
+    return digest
+
+
+def touch_upload(digest, path):
+    with _connect() as db:
+        db.execute(
+            "INSERT OR REPLACE INTO uploads (hash, path, size, last_used) "
+            "VALUES (?, ?, ?, ?)",
+            (digest, path, os.path.getsize(path), time.time()),
+        )
+
+
+def video_hash(path):
+    """Content hash of a video; free for content-addressed uploads."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if len(stem) == 64 and all(c in "0123456789abcdef" for c in stem):
+        return stem
+    return hash_file(path)
+
+
+# ======================================================
+# RESULT CACHE
+# ======================================================
+def cache_key(video_path, options=None):
+    """Key over the video contents and everything that shapes its results.
+
+    None for real-time runs, whose output depends on wall-clock drops.
+    """
+    from backend import analytics, process_video as pv
+    from backend.zones import ZoneMap
+
+    bound = inspect.signature(pv.process_video).bind_partial(
+        video_path, **(options or {})
+    )
+    bound.apply_defaults()
+    params = {
+        k: v for k, v in bound.arguments.items() if k not in _IGNORED_OPTIONS
+    }
+    if params["realtime"]:
+        return None
+
+    zones = pv.zone_config(params["zones"])
+    if isinstance(zones, ZoneMap):
+        zones = {"config": zones.config, "size": zones.size}
+    params["zones"] = zones
+
+    material = {
+        "version": CACHE_VERSION,
+        "video": video_hash(video_path),
+        "options": params,
+        "constants": {
+            "frame_skip": pv.FRAME_SKIP,
+            "adaptive_skip": pv.ADAPTIVE_SKIP,
+            "resize": [pv.RESIZE_WIDTH, pv.RESIZE_HEIGHT],
+            "speed_threshold": analytics.SPEED_THRESHOLD,
+            "queue_box": [analytics.QUEUE_X1, analytics.QUEUE_Y1,
+                          analytics.QUEUE_X2, analytics.QUEUE_Y2],
+            "stop_line_y": analytics.STOP_LINE_Y,
+        },
+    }
+    blob = json.dumps(material, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def lookup(key):
+    """Cached run dir for `key`, or None (stale entries are dropped)."""
+    if key is None:
+        return None
+
+    with _connect() as db:
+        row = db.execute("SELECT run_dir FROM runs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        run_dir = row["run_dir"]
+        complete = all(
+            os.path.exists(os.path.join(run_dir, name))
+            for name in ("traffic_log.csv", "summary.json")
+        )
+        if not complete:
+            db.execute("DELETE FROM runs WHERE key = ?", (key,))
+            return None
+
+        db.execute("UPDATE runs SET last_used = ? WHERE key = ?", (time.time(), key))
+        return run_dir
+
+
+def record(key, video_path, run_dir):
+    if key is None:
+        return
+
+    with _connect() as db:
+        db.execute(
+            "INSERT OR REPLACE INTO runs (key, video_hash, run_dir, size, last_used) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, video_hash(video_path), run_dir, _dir_size(run_dir), time.time()),
+        )
+
+
+def cached_run(video_path, options=None):
+    """(key, run_dir or None) for a video and process_video options."""
+    key = cache_key(video_path, options)
+    return key, lookup(key)
+
+
+# ======================================================
+# EVICTION
+# ======================================================
+def evict(max_bytes=MAX_CACHE_BYTES, keep=()):
+    """Delete least-recently-used runs/uploads until under `max_bytes`.
+
+    Paths in `keep` (uploads or run dirs still in use) are never removed.
+    Returns the removed paths.
+    """
+    keep = {os.path.abspath(p) for p in keep}
+    removed = []
+
+    with _connect() as db:
+        entries = [
+            ("runs", "key", r["key"], r["run_dir"], r["size"], r["last_used"])
+            for r in db.execute("SELECT * FROM runs")
+        ] + [
+            ("uploads", "hash", r["hash"], r["path"], r["size"], r["last_used"])
+            for r in db.execute("SELECT * FROM uploads")
+        ]
+
+        total = sum(e[4] for e in entries)
+        for table, column, ident, path, size, _ in sorted(entries, key=lambda e: e[5]):
+            if total <= max_bytes:
+                break
+            if os.path.abspath(path) in keep:
+                continue
+
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+            db.execute(f"DELETE FROM {table} WHERE {column} = ?", (ident,))
+            total -= size
+            removed.append(path)
+
+    return removed
@@ -0,0 +1,320 @@
+import argparse
+import os
+import queue
+import secrets
+import stat
+import tempfile
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+# ======================================================
+# LOCAL INFERENCE DAEMON
+# ======================================================
+# One long-lived process holds the warm YOLO models; dashboard sessions, CLI
+# runs and batch workers send it frame batches instead of loading their own.
+#
+#   server : `python -m backend.daemon --address unix:/tmp/traffic.sock`
+#   client : set TRAFFIC_INFERENCE_ADDRESS to the same address and
+#            `get_detector` returns a RemoteDetector, which is called exactly
+#            like the YOLO model, so the rest of the pipeline is unchanged
+#
+# Frames travel through a shared-memory block owned by the client; only the
+# block name, frame offsets/shapes and the small per-frame box arrays go over
+# the socket. Requests waiting at the same time from different clients are
+# merged into one detector call.
+#
+# Connections are pickled, so only the daemon's user may talk to it: the
+# default address is a 0600 Unix socket in the user's runtime dir, and the
+# auth key is TRAFFIC_INFERENCE_KEY or a random key the daemon writes to a
+# 0600 file (never a built-in default). Clients may only use the models the
+# daemon was started with, and only the detector options run_batch sends.
+
+ADDRESS_ENV = "TRAFFIC_INFERENCE_ADDRESS"
+AUTHKEY_ENV = "TRAFFIC_INFERENCE_KEY"
+KEY_PATH = os.environ.get(
+    "TRAFFIC_INFERENCE_KEY_FILE",
+    os.path.join(os.path.expanduser("~"), ".cache", "traffic-intelligence",
+                 "inference.key"),
+)
+DEFAULT_ADDRESS = "unix:" + os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(),
+    f"traffic-inference-{os.getuid() if hasattr(os, 'getuid') else 'user'}.sock",
+)
+MAX_BATCH = 16
+ALLOWED_KWARGS = {"classes", "conf", "iou", "imgsz", "max_det"}
+
+
+def parse_address(address):
+    """"unix:/path" -> "/path"; "host:port" -> (host, port)."""
+    if address.startswith("unix:"):
+        return address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return (host or "127.0.0.1", int(port))
+
+
+def _authkey(create=False, path=KEY_PATH):
+    """TRAFFIC_INFERENCE_KEY, else the private key file (made by the server)."""
+    key = os.environ.get(AUTHKEY_ENV)
+    if key:
+        return key.encode()
+
+    if create and not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        raise RuntimeError(
+            f"No inference daemon key: set {AUTHKEY_ENV} or start the daemon, "
+            f"which writes one to {path}"
+        ) from None
+    if mode & (stat.S_IRWXG | stat.S_IRWXO):
+        raise RuntimeError(f"{path} must not be readable by others (chmod 600)")
+
+    with open(path) as f:
+        return f.read().strip().encode()
+
+
+def _attach(name):
+    """Attach to a client's block without adopting it (the client unlinks)."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:           # Python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+# ======================================================
+# SERVER
+# ======================================================
+class InferenceServer:
+    """Serves detection for the `weights` it was started with, and no others."""
+
+    def __init__(self, address=DEFAULT_ADDRESS, max_batch=MAX_BATCH,
+                 weights=("yolov8n.pt",)):
+        self.address = parse_address(address)
+        self.max_batch = max_batch
+        self.weights = set(weights)
+        self._requests = queue.Queue()
+
+    def _refuse(self, msg):
+        """Error text if a client message asks for something not served."""
+        if msg.get("weights") not in self.weights:
+            return f"model not served by this daemon: {msg.get('weights')}"
+        extra = set(msg.get("kwargs", {})) - ALLOWED_KWARGS
+        if extra:
+            return f"detector options not allowed: {sorted(extra)}"
+        return None
+
+    # -------- model worker: merges concurrent requests --------
+    def _work(self):
+        from backend.models import load_detector
+
+        while True:
+            first = self._requests.get()
+            batch = [first]
+            frames = len(first["images"])
+
+            while frames < self.max_batch:
+                try:
+                    nxt = self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt["key"] != first["key"]:
+                    self._requests.put(nxt)
+                    break
+                batch.append(nxt)
+                frames += len(nxt["images"])
+
+            weights, kwargs = first["key"][0], dict(first["key"][1])
+            counts = [len(req["images"]) for req in batch]
+            images = [img for req in batch for img in req["images"]]
+            try:
+                results = load_detector(weights)(images, verbose=False, **kwargs)
+                boxes = [
+                    (
+                        r.boxes.xyxy.cpu().numpy().astype(np.float32),
+                        r.boxes.conf.cpu().numpy().astype(np.float32),
+                        r.boxes.cls.cpu().numpy().astype(np.int32),
+                    )
+                    for r in results
+                ]
+                error = None
+            except Exception as exc:
+                boxes, error = [], f"{type(exc).__name__}: {exc}"
+
+            # Results keep views into the clients' shared memory; drop every
+            # reference before the clients close their blocks.
+            results = images = None
+            for req in batch:
+                req["images"] = None
+
+            start = 0
+            for req, n in zip(batch, counts):
+                req["reply"] = {"ok": error is None, "error": error,
+                                "results": boxes[start:start + n]}
+                start += n
+                req["done"].set()
+
+    # -------- one thread per client connection --------
+    def _serve_client(self, conn):
+        from backend.models import load_detector
+
+        with conn:
+            while True:
+                try:
+                    msg = conn.recv()
+                except EOFError:
+                    return
+
+                refused = self._refuse(msg)
+                if refused:
+                    conn.send({"ok": False, "error": refused})
+                    continue
+
+                if msg["op"] == "hello":
+                    model = load_detector(msg["weights"])
+                    conn.send({"ok": True, "names": dict(model.names)})
+                    continue
+
+                shm = _attach(msg["shm"])
+                try:
+                    images = [
+                        np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+                        for offset, shape in msg["frames"]
+                    ]
+                    key = (msg["weights"], tuple(sorted(msg["kwargs"].items())))
+                    req = {"key": key, "images": images, "done": threading.Event()}
+                    self._requests.put(req)
+                    req["done"].wait()
+                    del images
+                finally:
+                    shm.close()
+
+                conn.send(req["reply"])
+
+    def serve_forever(self):
+        authkey = _authkey(create=True)
+        unix = isinstance(self.address, str)
+        if unix and os.path.exists(self.address):
+            os.unlink(self.address)
+
+        threading.Thread(target=self._work, name="inference", daemon=True).start()
+
+        # The socket is created 0600 (umask), so only this user can connect
+        umask = os.umask(0o177) if unix else None
+        try:
+            listener = Listener(self.address, authkey=authkey)
+        finally:
+            if umask is not None:
+                os.umask(umask)
+
+        with listener:
+            print(f"Inference daemon listening on {listener.address}")
+            while True:
+                conn = listener.accept()
+                threading.Thread(target=self._serve_client, args=(conn,),
+                                 daemon=True).start()
+
+
+# ======================================================
+# CLIENT
+# ======================================================
+class _Boxes:
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.xyxy)
+
+
+class _Result:
+
+    def __init__(self, boxes):
+        self.boxes = _Boxes(*boxes)
+
+
+class RemoteDetector:
+    """Thin client with the YOLO call signature, backed by the daemon."""
+
+    def __init__(self, address=None, weights="yolov8n.pt"):
+        address = address or os.environ.get(ADDRESS_ENV, DEFAULT_ADDRESS)
+        self.weights = weights
+        self._conn = Client(parse_address(address), authkey=_authkey())
+        self._lock = threading.Lock()
+        self._shm = None
+
+        self.names = self._call({"op": "hello", "weights": weights})["names"]
+
+    def _call(self, msg):
+        self._conn.send(msg)
+        reply = self._conn.recv()
+        if not reply["ok"]:
+            raise RuntimeError(f"Inference daemon error: {reply['error']}")
+        return reply
+
+    def _block(self, nbytes):
+        """Shared-memory block of at least `nbytes`, grown as needed."""
+        if self._shm is None or self._shm.size < nbytes:
+            self.close_shm()
+            self._shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        return self._shm
+
+    def __call__(self, images, verbose=False, **kwargs):
+        if isinstance(images, np.ndarray):
+            images = [images]
+        images = [np.ascontiguousarray(img, dtype=np.uint8) for img in images]
+
+        with self._lock:
+            shm = self._block(sum(img.nbytes for img in images))
+            frames, offset = [], 0
+            for img in images:
+                np.ndarray(img.shape, np.uint8, buffer=shm.buf, offset=offset)[:] = img
+                frames.append((offset, img.shape))
+                offset += img.nbytes
+
+            reply = self._call({
+                "op": "detect",
+                "weights": self.weights,
+                "shm": shm.name,
+                "frames": frames,
+                "kwargs": kwargs,
+            })
+
+        return [_Result(boxes) for boxes in reply["results"]]
+
+    def close_shm(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def close(self):
+        self.close_shm()
+        self._conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local YOLO inference daemon")
+    parser.add_argument("--address", default=os.environ.get(ADDRESS_ENV, DEFAULT_ADDRESS),
+                        help='"unix:/path/to.sock" or "host:port"')
+    parser.add_argument("--weights", nargs="+", default=["yolov8n.pt"],
+                        help="models to load and serve (clients get no others)")
+    args = parser.parse_args()
+
+    from backend.models import load_detector
+    from backend.tuning import apply_tuning
+    apply_tuning()
+    for weights in args.weights:
+        load_detector(weights)
+    InferenceServer(args.address, weights=args.weights).serve_forever()
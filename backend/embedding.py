@@ -0,0 +1,116 @@
+import numpy as np
+
+from backend.geometry import iou_matrix
+
+# ======================================================
+# AMORTIZED DEEPSORT EMBEDDING
+# ======================================================
+# DeepSORT embeds every detection crop on every update. This policy sits in
+# front of `update_tracks` and hands it precomputed embeddings instead:
+#
+#   - a detection that sits almost exactly on a track's last embedded box
+#     (IoU >= `reuse_iou`) reuses that track's embedding, for up to
+#     `refresh_every` frames
+#   - a detection overlapping more than one track (IoU >= `ambiguous_iou`)
+#     is always re-embedded, since that is where appearance decides the match
+#   - everything else is cropped and embedded in a single embedder call
+#
+# With `refresh_every=1` nothing is reused: every detection is embedded, as
+# plain DeepSORT does, but still in one batched call per frame.
+
+
+def _crops(frame, ltrb):
+    h, w = frame.shape[:2]
+    return [
+        frame[max(0, t):min(h, b), max(0, l):min(w, r)]
+        for l, t, r, b in ltrb.tolist()
+    ]
+
+
+class EmbeddingPolicy:
+
+    def __init__(self, refresh_every=10, reuse_iou=0.9, ambiguous_iou=0.3):
+        self.refresh_every = refresh_every
+        self.reuse_iou = reuse_iou
+        self.ambiguous_iou = ambiguous_iou
+
+        self.frame = 0
+        self.computed = 0
+        self.reused = 0
+        self.ambiguous = 0
+
+        # track_id -> (ltrb box, embedding, frame embedded)
+        self._cache = {}
+
+    def stats(self):
+        total = self.computed + self.reused
+        return {
+            "embeddings_computed": self.computed,
+            "embeddings_reused": self.reused,
+            "embeddings_ambiguous": self.ambiguous,
+            "reuse_ratio": round(self.reused / total, 3) if total else 0.0,
+        }
+
+    def _reusable(self, det_ltrb):
+        """Cached embedding per detection, or None where one must be computed."""
+        out = [None] * len(det_ltrb)
+        if self.refresh_every <= 1 or not self._cache or not len(det_ltrb):
+            return out
+
+        ids = list(self._cache)
+        cached = np.array([self._cache[tid][0] for tid in ids], dtype=np.float64)
+        iou = iou_matrix(det_ltrb.astype(np.float64), cached)
+
+        overlaps = (iou >= self.ambiguous_iou).sum(axis=1)
+        best = iou.argmax(axis=1)
+
+        for i in range(len(det_ltrb)):
+            if overlaps[i] > 1:
+                self.ambiguous += 1
+                continue
+
+            _, feature, frame = self._cache[ids[best[i]]]
+            fresh = self.frame - frame < self.refresh_every
+            if fresh and iou[i, best[i]] >= self.reuse_iou:
+                out[i] = feature
+
+        return out
+
+    def update(self, deepsort, raw_dets, frame):
+        """`deepsort.update_tracks` with reused or batch-computed embeddings."""
+        self.frame += 1
+
+        det_ltrb = np.array([d[0] for d in raw_dets], dtype=np.int64).reshape(-1, 4)
+        det_ltrb[:, 2:] += det_ltrb[:, :2]
+
+        embeds = self._reusable(det_ltrb)
+        missing = [i for i, e in enumerate(embeds) if e is None]
+
+        if missing:
+            crops = _crops(frame, det_ltrb[missing])
+            for i, feature in zip(missing, deepsort.embedder.predict(crops)):
+                embeds[i] = feature
+        self.computed += len(missing)
+        self.reused += len(raw_dets) - len(missing)
+
+        tracks = deepsort.update_tracks(raw_dets, embeds=embeds)
+        self._remember(tracks, det_ltrb, embeds, set(missing))
+        return tracks
+
+    def _remember(self, tracks, det_ltrb, embeds, fresh):
+        """Cache freshly computed embeddings under the track they updated."""
+        index = {tuple(box): i for i, box in enumerate(det_ltrb.tolist())}
+        alive = set()
+
+        for t in tracks:
+            alive.add(t.track_id)
+            if t.time_since_update != 0:
+                continue
+
+            l, t_, r, b = map(int, t.to_ltrb(orig=True))
+            i = index.get((l, t_, r, b))
+            if i is not None and i in fresh:
+                self._cache[t.track_id] = ((l, t_, r, b), embeds[i], self.frame)
+
+        for tid in [tid for tid in self._cache if tid not in alive]:
+            del self._cache[tid]
@@ -0,0 +1,251 @@
+import argparse
+import itertools
+import json
+import os
+import shutil
+import time
+
+import cv2
+import numpy as np
+
+from backend.geometry import iou_matrix
+from backend.models import load_detector, run_batch, vehicle_detections
+from backend.trackers import match
+from src.video_loader import FrameSource
+
+# ======================================================
+# CPU DETECTOR BACKENDS (ONNX RUNTIME / OPENVINO)
+# ======================================================
+# ultralytics loads exported models itself, so an exported detector is just a
+# different `weights` path and returns the same results (and therefore the
+# same vehicle `Detections`) as the PyTorch model:
+#
+#   "torch"    - yolov8n.pt
+#   "onnx"     - yolov8n.onnx                (ONNX Runtime)
+#   "openvino" - yolov8n_openvino_model/     (OpenVINO IR)
+#
+# Exports use dynamic shapes, so batching, ROI crops and per-camera sizes
+# work as with the .pt model. With `int8=True` the exported model is
+# statically quantized from a calibration set of our own frames (ONNX
+# Runtime quantization / NNCF), saved next to it with an "_int8" suffix.
+#
+#   python -m backend.export export --backend onnx --int8 --calibration clip.mp4
+#   python -m backend.export parity clip.mp4 --backends torch onnx openvino
+
+DETECTOR_BACKENDS = ("torch", "onnx", "openvino")
+CALIBRATION_FRAMES = 200
+CALIBRATION_SIZE = (512, 288)       # processing resolution the frames are fed at
+INPUT_SHAPE = (384, 640)            # letterboxed detector input (h, w) for it
+PAD_VALUE = 114
+
+
+def exported_path(weights="yolov8n.pt", backend="torch", int8=False):
+    """Where the model for `backend` lives (the .pt itself for torch)."""
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown detector backend: {backend}")
+    if backend == "torch":
+        return weights
+
+    stem = os.path.splitext(weights)[0] + ("_int8" if int8 else "")
+    if backend == "onnx":
+        return stem + ".onnx"
+    return stem + "_openvino_model"
+
+
+# ======================================================
+# CALIBRATION FRAMES
+# ======================================================
+def calibration_frames(source, n=CALIBRATION_FRAMES, size=CALIBRATION_SIZE):
+    """Up to `n` frames spread over a video or image directory, resized."""
+    with FrameSource(source, size=size) as probe:
+        total = probe.frame_count or n
+
+    with FrameSource(source, frame_skip=max(1, total // n), size=size) as frames:
+        return [f.image for f in itertools.islice(frames, n)]
+
+
+def _blob(image, shape=INPUT_SHAPE):
+    """Letterboxed, RGB, NCHW float32 detector input for one BGR frame."""
+    h, w = image.shape[:2]
+    scale = min(shape[0] / h, shape[1] / w)
+    nh, nw = round(h * scale), round(w * scale)
+
+    canvas = np.full((shape[0], shape[1], 3), PAD_VALUE, dtype=np.uint8)
+    top, left = (shape[0] - nh) // 2, (shape[1] - nw) // 2
+    canvas[top:top + nh, left:left + nw] = cv2.resize(image, (nw, nh))
+
+    rgb = canvas[..., ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(rgb, dtype=np.float32)[None] / 255.0
+
+
+# ======================================================
+# EXPORT + INT8 QUANTIZATION
+# ======================================================
+def _quantize_onnx(src, dst, frames):
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            name = onnx.load(src, load_external_data=False).graph.input[0].name
+            self._feeds = iter({name: _blob(img)} for img in frames)
+
+        def get_next(self):
+            return next(self._feeds, None)
+
+    quantize_static(src, dst, Reader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8, per_channel=True)
+
+    # Keep the ultralytics metadata (names, stride, task) on the INT8 model
+    fp32, int8 = onnx.load(src), onnx.load(dst)
+    del int8.metadata_props[:]
+    int8.metadata_props.extend(fp32.metadata_props)
+    onnx.save(int8, dst)
+
+
+def _quantize_openvino(src_dir, dst_dir, frames):
+    import nncf
+    import openvino as ov
+
+    xml = next(name for name in os.listdir(src_dir) if name.endswith(".xml"))
+    model = ov.Core().read_model(os.path.join(src_dir, xml))
+    dataset = nncf.Dataset(frames, _blob)
+    quantized = nncf.quantize(model, dataset, subset_size=len(frames),
+                              preset=nncf.QuantizationPreset.MIXED)
+
+    os.makedirs(dst_dir, exist_ok=True)
+    ov.save_model(quantized, os.path.join(dst_dir, xml))
+    shutil.copy(os.path.join(src_dir, "metadata.yaml"), dst_dir)
+
+
+def export_detector(weights="yolov8n.pt", backend="onnx", int8=False,
+                    calibration=None, n_calibration=CALIBRATION_FRAMES):
+    """Export (and optionally INT8-quantize) `weights`; returns the model path."""
+    out = exported_path(weights, backend, int8)
+    if backend == "torch" or os.path.exists(out):
+        return out
+
+    fp32 = exported_path(weights, backend)
+    if not os.path.exists(fp32):
+        from ultralytics import YOLO
+        exported = YOLO(weights).export(format=backend, dynamic=True)
+        if os.path.normpath(str(exported)) != os.path.normpath(fp32):
+            shutil.move(str(exported), fp32)
+    if not int8:
+        return fp32
+
+    if calibration is None:
+        raise ValueError("INT8 export needs a calibration video or image directory")
+    frames = calibration_frames(calibration, n_calibration)
+
+    if backend == "onnx":
+        _quantize_onnx(fp32, out, frames)
+    else:
+        _quantize_openvino(fp32, out, frames)
+    return out
+
+
+# ======================================================
+# PARITY CHECK
+# ======================================================
+def agreement(reference, candidate, min_iou=0.5):
+    """Detection agreement of `candidate` with `reference` over all frames.
+
+    A candidate box agrees when it matches a reference box of the same class
+    with IoU >= `min_iou` (one-to-one per frame).
+    """
+    matched = n_ref = n_cand = 0
+    ious = []
+
+    for ref, cand in zip(reference, candidate):
+        n_ref += len(ref.xyxy)
+        n_cand += len(cand.xyxy)
+        if not len(ref.xyxy) or not len(cand.xyxy):
+            continue
+
+        iou = iou_matrix(ref.xyxy.astype(np.float64), cand.xyxy.astype(np.float64))
+        iou[ref.cls[:, None] != cand.cls[None, :]] = 0.0
+        rows, cols = match(iou, min_iou)
+        matched += len(rows)
+        ious.extend(iou[rows, cols].tolist())
+
+    precision = matched / n_cand if n_cand else 1.0
+    recall = matched / n_ref if n_ref else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "detections": n_cand,
+        "reference_detections": n_ref,
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(f1, 4),
+        "mean_iou": round(float(np.mean(ious)), 4) if ious else None,
+    }
+
+
+def parity_check(source, backends=DETECTOR_BACKENDS, weights="yolov8n.pt",
+                 int8=False, n_frames=100, batch_size=4):
+    """Per-backend agreement with the first backend in `backends`, plus FPS."""
+    frames = calibration_frames(source, n_frames)
+    reference = None
+    report = []
+
+    for backend in backends:
+        quantized = int8 and backend != "torch"
+        path = export_detector(weights, backend, quantized, calibration=source)
+        model = load_detector(path, (frames[0].shape[0], frames[0].shape[1]))
+
+        detections = []
+        start = time.perf_counter()
+        for i in range(0, len(frames), batch_size):
+            for result in run_batch(model, frames[i:i + batch_size]):
+                detections.append(vehicle_detections(model, result))
+        elapsed = time.perf_counter() - start
+
+        if reference is None:
+            reference = detections
+
+        report.append({
+            "backend": backend,
+            "int8": quantized,
+            "weights": path,
+            "frames": len(frames),
+            "fps": round(len(frames) / elapsed, 2),
+            **agreement(reference, detections),
+        })
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU detector backends")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    exp = sub.add_parser("export", help="export an ONNX / OpenVINO detector")
+    exp.add_argument("--weights", default="yolov8n.pt")
+    exp.add_argument("--backend", choices=DETECTOR_BACKENDS[1:], default="onnx")
+    exp.add_argument("--int8", action="store_true")
+    exp.add_argument("--calibration", help="video or image directory for INT8")
+    exp.add_argument("--frames", type=int, default=CALIBRATION_FRAMES)
+
+    par = sub.add_parser("parity", help="compare backends on a sample clip")
+    par.add_argument("source")
+    par.add_argument("--weights", default="yolov8n.pt")
+    par.add_argument("--backends", nargs="+", choices=DETECTOR_BACKENDS,
+                     default=list(DETECTOR_BACKENDS))
+    par.add_argument("--int8", action="store_true")
+    par.add_argument("--frames", type=int, default=100)
+
+    args = parser.parse_args()
+    if args.command == "export":
+        print(export_detector(args.weights, args.backend, args.int8,
+                              args.calibration, args.frames))
+    else:
+        report = parity_check(args.source, args.backends, args.weights,
+                              args.int8, args.frames)
+        print(json.dumps(report, indent=4))
@@ -0,0 +1,17 @@
+import numpy as np
+
+# ======================================================
+# BOX GEOMETRY
+# ======================================================
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU of (n, 4) and (m, 4) xyxy boxes -> (n, m)."""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    wh = np.clip(rb - lt, 0, None)
+    inter = wh[..., 0] * wh[..., 1]
+
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+import cv2
+
+from backend.cache import CHUNK_SIZE, UPLOAD_DIR, touch_upload
+
+# ======================================================
+# STREAMING UPLOAD INGESTION
+# ======================================================
+# An upload is copied to uploads/incoming/<id><ext> one chunk at a time and
+# hashed on the way, so memory stays at one chunk however large the file is.
+# Container metadata (FPS, resolution, frame count, duration) is probed from
+# the partial file every PROBE_EVERY bytes until it opens, which for MKV /
+# AVI / TS and fast-start MP4 is after the first few megabytes.
+#
+# Processing can start on the incoming path before the copy is done: a
+# sidecar <incoming>.json records "writing" / "done", and FrameSource follows
+# a file that is still being written (`follow=still_writing(path)`). When the
+# copy finishes it is hard-linked to the content-addressed uploads/<sha256>
+# <ext>; the incoming name is dropped once its job no longer needs it. An
+# interrupted copy is marked "aborted", and a job following it fails instead
+# of finishing on the truncated file.
+
+PROBE_EVERY = 8 * 1024 * 1024
+STALL_S = 60                    # a "writing" upload untouched this long is dead
+
+
+class UploadAborted(Exception):
+    pass
+
+
+def probe_video(path):
+    """Container metadata of a (possibly partial) video, or None."""
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if width <= 0 or height <= 0:
+            return None
+        return {
+            "fps": round(fps, 3),
+            "width": width,
+            "height": height,
+            "frame_count": frames if frames > 0 else None,
+            "duration_s": round(frames / fps, 2) if fps > 0 and frames > 0 else None,
+        }
+    finally:
+        cap.release()
+
+
+# ======================================================
+# SIDECAR STATE
+# ======================================================
+def _sidecar(path):
+    return path + ".json"
+
+
+def ingest_state(path):
+    """Sidecar state of an incoming upload, or None for any other path."""
+    try:
+        with open(_sidecar(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def still_writing(path):
+    """`FrameSource(follow=...)` callable for an incoming upload, or None."""
+    if ingest_state(path) is None:
+        return None
+
+    def follow():
+        state = ingest_state(path)
+        if state is not None and state["state"] == "aborted":
+            raise UploadAborted(f"Upload was interrupted: {path}")
+        if state is None or state["state"] != "writing":
+            return False
+        try:
+            return time.time() - os.path.getmtime(path) < STALL_S
+        except OSError:
+            return False
+
+    return follow
+
+
+def resolve_upload(path):
+    """Content-addressed path of a finished incoming upload, else `path`."""
+    state = ingest_state(path)
+    if state and state["state"] == "done":
+        return state["path"]
+    return path
+
+
+def release_upload(path):
+    """Drop a finished or aborted incoming upload's name and sidecar."""
+    state = ingest_state(path)
+    if state and state["state"] in ("done", "aborted"):
+        for p in (path, _sidecar(path)):
+            if os.path.exists(p):
+                os.remove(p)
+
+
+# ======================================================
+# INGEST
+# ======================================================
+class Ingest:
+    """One upload being copied to disk; `path` is readable while it grows."""
+
+    def __init__(self, name, upload_dir=UPLOAD_DIR):
+        self.upload_dir = upload_dir
+        self.ext = os.path.splitext(name)[1].lower()
+        incoming = os.path.join(upload_dir, "incoming")
+        os.makedirs(incoming, exist_ok=True)
+
+        self.path = os.path.join(incoming, uuid.uuid4().hex + self.ext)
+        self.bytes = 0
+        self.digest = None
+        self.final = None
+        self.meta = None
+
+        self._hash = hashlib.sha256()
+        self._file = open(self.path, "wb")
+        self._next_probe = PROBE_EVERY
+        self._write_state("writing")
+
+    def _write_state(self, state):
+        tmp = _sidecar(self.path) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"state": state, "path": self.final, "bytes": self.bytes,
+                       "sha256": self.digest, "meta": self.meta}, f)
+        os.replace(tmp, _sidecar(self.path))
+
+    def write(self, chunk):
+        self._hash.update(chunk)
+        self._file.write(chunk)
+        self.bytes += len(chunk)
+
+        if self.meta is None and self.bytes >= self._next_probe:
+            self._file.flush()
+            self.meta = probe_video(self.path)
+            self._next_probe += PROBE_EVERY
+            if self.meta is not None:
+                self._write_state("writing")
+
+    def finish(self):
+        """Close, link to uploads/<sha256><ext> and return that path."""
+        self._file.close()
+        self.digest = self._hash.hexdigest()
+        self.final = os.path.join(self.upload_dir, self.digest + self.ext)
+
+        if not os.path.exists(self.final):
+            try:
+                os.link(self.path, self.final)
+            except OSError:
+                shutil.copyfile(self.path, self.final)
+        if self.meta is None:
+            self.meta = probe_video(self.final)
+
+        touch_upload(self.digest, self.final)
+        self._write_state("done")
+        return self.final
+
+    def abort(self):
+        """Drop the partial file; the sidecar stays as "aborted" so a job
+        already following it fails (release_upload removes it)."""
+        self._file.close()
+        self._write_state("aborted")
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def ingest_stream(fileobj, name, on_ready=None, on_progress=None,
+                  chunk_size=CHUNK_SIZE, upload_dir=UPLOAD_DIR):
+    """Stream a file-like upload to disk; returns the finished `Ingest`.
+
+    `on_ready(ingest)` is called once, as soon as the partial file probes as
+    a video (processing can start on `ingest.path` from there), and
+    `on_progress(ingest)` after every chunk.
+    """
+    ingest = Ingest(name, upload_dir)
+    ready = False
+    try:
+        for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+            ingest.write(chunk)
+            if not ready and ingest.meta is not None and on_ready is not None:
+                ready = True
+                on_ready(ingest)
+            if on_progress is not None:
+                on_progress(ingest)
+        ingest.finish()
+    except BaseException:
+        ingest.abort()
+        raise
+
+    if not ready and on_ready is not None:
+        on_ready(ingest)
+    return ingest
+
+
+def sweep_incoming(max_age_s=24 * 3600, upload_dir=UPLOAD_DIR, keep=()):
+    """Remove incoming files left behind by crashed or abandoned uploads.
+
+    Uploads in `keep` (e.g. paths of queued jobs) and their sidecars stay.
+    """
+    incoming = os.path.join(upload_dir, "incoming")
+    if not os.path.isdir(incoming):
+        return
+    keep = {os.path.abspath(p) for p in keep}
+    cutoff = time.time() - max_age_s
+    for name in os.listdir(incoming):
+        path = os.path.join(incoming, name)
+        upload = os.path.join(incoming, name.split(".json")[0])    # sidecar -> upload
+        if os.path.abspath(upload) in keep:
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
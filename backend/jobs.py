@@ -0,0 +1,358 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime
+
+# ======================================================
+# BACKGROUND JOBS
+# ======================================================
+# Video processing runs as jobs in a persistent SQLite queue, picked up by a
+# pool of worker processes, so the dashboard only submits and polls.
+#
+#   queued -> running -> done | failed | cancelled
+#
+# Workers report progress (raw frames read / total, processed FPS, ETA) at
+# most once per PROGRESS_EVERY_S and check for cancellation at the same
+# time; a cancelled running job stops at its next progress report (a
+# real-time job ends its stream there and finishes with its results). Jobs
+# left "running" by a worker that died are re-queued when a pool starts.
+#
+# Jobs go through the result cache (backend.cache): a video already processed
+# with the same options finishes at once with the existing run dir, and new
+# runs are recorded and may evict older ones (never a queued job's video).
+# Starting a pool also sweeps incoming uploads abandoned by a crash.
+#
+#   python -m backend.jobs --concurrency 2      (standalone worker pool)
+
+JOBS_DB = "jobs.db"
+POLL_S = 1.0
+PROGRESS_EVERY_S = 1.0
+
+ACTIVE_STATES = ("queued", "running")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_path TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    state TEXT NOT NULL DEFAULT 'queued',
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    frames_done INTEGER NOT NULL DEFAULT 0,
+    frames_total INTEGER,
+    fps REAL,
+    eta_s REAL,
+    run_dir TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker_pid INTEGER
+)
+"""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# ======================================================
+# QUEUE
+# ======================================================
+class JobQueue:
+    """SQLite-backed job table shared by the dashboard and the workers."""
+
+    def __init__(self, path=JOBS_DB):
+        self.path = path
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _update(self, job_id, **fields):
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {cols} WHERE id = ?",
+                       (*fields.values(), job_id))
+
+    # -------- dashboard side --------
+    def submit(self, video_path, **options):
+        with self._connect() as db:
+            cur = db.execute(
+                "INSERT INTO jobs (video_path, options, created_at) VALUES (?, ?, ?)",
+                (video_path, json.dumps(options), _now()),
+            )
+            return cur.lastrowid
+
+    def get(self, job_id):
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, limit=20):
+        with self._connect() as db:
+            rows = db.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?",
+                              (limit,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def cancel(self, job_id):
+        """Cancel a queued job now, or ask a running one to stop."""
+        from backend.ingest import release_upload
+
+        with self._connect() as db:
+            cur = db.execute(
+                "UPDATE jobs SET state = 'cancelled', finished_at = ? "
+                "WHERE id = ? AND state = 'queued'",
+                (_now(), job_id),
+            )
+            if cur.rowcount:
+                # Never claimed, so no worker will release its upload
+                row = db.execute("SELECT video_path FROM jobs WHERE id = ?",
+                                 (job_id,)).fetchone()
+                release_upload(row["video_path"])
+            db.execute(
+                "UPDATE jobs SET cancel_requested = 1 "
+                "WHERE id = ? AND state = 'running'",
+                (job_id,),
+            )
+
+    def active_videos(self):
+        """Video paths of queued or running jobs.
+
+        An incoming upload's finished uploads/<sha256> path is included too,
+        since that is the file its job goes on to read.
+        """
+        from backend.ingest import resolve_upload
+
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT DISTINCT video_path FROM jobs WHERE state IN (?, ?)",
+                ACTIVE_STATES,
+            ).fetchall()
+        paths = [r["video_path"] for r in rows]
+        return sorted(set(paths) | {resolve_upload(p) for p in paths})
+
+    # -------- worker side --------
+    def claim(self, pid):
+        """Atomically take the oldest queued job, or None."""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT * FROM jobs WHERE state = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute(
+                "UPDATE jobs SET state = 'running', started_at = ?, worker_pid = ? "
+                "WHERE id = ?",
+                (_now(), pid, row["id"]),
+            )
+            db.execute("COMMIT")
+        return dict(row)
+
+    def report(self, job_id, frames_done, frames_total, fps, eta_s):
+        """Store progress; returns True if cancellation was requested."""
+        self._update(job_id, frames_done=frames_done, frames_total=frames_total,
+                     fps=fps, eta_s=eta_s)
+        with self._connect() as db:
+            row = db.execute("SELECT cancel_requested FROM jobs WHERE id = ?",
+                             (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def finish(self, job_id, state, run_dir=None, error=None):
+        self._update(job_id, state=state, run_dir=run_dir, error=error,
+                     finished_at=_now(), eta_s=None)
+        if state == "done":
+            with self._connect() as db:
+                db.execute("UPDATE jobs SET frames_done = frames_total "
+                           "WHERE id = ? AND frames_total IS NOT NULL", (job_id,))
+
+    def recover(self):
+        """Re-queue jobs whose worker process is gone."""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id, worker_pid FROM jobs WHERE state = 'running'"
+            ).fetchall()
+        for row in rows:
+            if row["worker_pid"] is None or not _pid_alive(row["worker_pid"]):
+                self._update(row["id"], state="queued", worker_pid=None,
+                             started_at=None)
+
+
+# ======================================================
+# WORKERS
+# ======================================================
+class _Progress:
+    """process_video progress callback that reports to the queue.
+
+    A cancel raises JobCancelled, except for real-time jobs: those get
+    `stop_event` set, so the live run ends cleanly and keeps its summary.
+    """
+
+    def __init__(self, queue, job_id, stop_event=None):
+        self.queue = queue
+        self.job_id = job_id
+        self.stop_event = stop_event
+        self.started = time.monotonic()
+        self.processed = 0
+        self._last = 0.0
+
+    def __call__(self, position, total):
+        self.processed += 1
+        now = time.monotonic()
+        if now - self._last < PROGRESS_EVERY_S:
+            return
+        self._last = now
+
+        elapsed = now - self.started
+        fps = self.processed / elapsed if elapsed > 0 else None
+        eta = None
+        if total and position:
+            eta = elapsed * (total - position) / position
+
+        if self.queue.report(self.job_id, position, total,
+                             round(fps, 2) if fps else None,
+                             round(eta, 1) if eta is not None else None):
+            if self.stop_event is None:
+                raise JobCancelled()
+            self.stop_event.set()
+
+
+def run_job(queue, job):
+    from backend import cache
+    from backend.ingest import ingest_state, release_upload, resolve_upload
+    from backend.process_video import process_video
+
+    options = json.loads(job["options"] or "{}")
+    video_path = resolve_upload(job["video_path"])
+    try:
+        # An upload still being ingested has no content hash to look up yet
+        key = run_dir = None
+        state = ingest_state(video_path)
+        if state is None or state["state"] == "done":
+            key, run_dir = cache.cached_run(video_path, options)
+
+        if run_dir is None:
+            stop_event = threading.Event() if options.get("realtime") else None
+            progress = _Progress(queue, job["id"], stop_event)
+            run_dir = process_video(video_path, progress=progress,
+                                    stop_event=stop_event, **options)
+            video_path = resolve_upload(video_path)
+            if ingest_state(video_path) is None and os.path.exists(video_path):
+                key = key or cache.cache_key(video_path, options)
+                cache.record(key, video_path, run_dir)
+            cache.evict(keep=queue.active_videos())
+    except JobCancelled:
+        queue.finish(job["id"], "cancelled")
+    except Exception:
+        queue.finish(job["id"], "failed", error=traceback.format_exc())
+    else:
+        queue.finish(job["id"], "done", run_dir=run_dir)
+    finally:
+        release_upload(job["video_path"])
+
+
+def _worker_main(db_path, concurrency=1, poll_s=POLL_S):
+    from backend.models import preload
+    from backend.tuning import apply_tuning
+
+    apply_tuning(workers=concurrency)
+
+    # Warm the detector and embedder now, so the first job does not pay
+    # for it; a failure here shows up again in that job's error
+    try:
+        preload()
+    except Exception:
+        traceback.print_exc()
+
+    queue = JobQueue(db_path)
+    while True:
+        job = queue.claim(os.getpid())
+        if job is None:
+            time.sleep(poll_s)
+            continue
+        run_job(queue, job)
+
+
+class WorkerPool:
+    """`concurrency` worker processes draining the job queue."""
+
+    def __init__(self, concurrency=1, db_path=JOBS_DB):
+        self.concurrency = max(1, int(concurrency))
+        self.db_path = db_path
+        self.processes = []
+
+    def start(self):
+        from backend.ingest import sweep_incoming
+
+        queue = JobQueue(self.db_path)
+        queue.recover()
+        # Incoming files of crashed uploads, never those a job still needs
+        sweep_incoming(keep=queue.active_videos())
+
+        ctx = multiprocessing.get_context("spawn")
+        for i in range(self.concurrency):
+            proc = ctx.Process(target=_worker_main,
+                               args=(self.db_path, self.concurrency),
+                               name=f"job-worker-{i}", daemon=True)
+            proc.start()
+            self.processes.append(proc)
+        return self
+
+    def stop(self):
+        for proc in self.processes:
+            proc.terminate()
+        for proc in self.processes:
+            proc.join()
+        self.processes = []
+
+
+def default_concurrency():
+    """Tuned worker count for this machine, else one job at a time."""
+    from backend.tuning import load_tuning
+
+    return int(os.environ.get("TRAFFIC_JOB_CONCURRENCY")
+               or (load_tuning() or {}).get("workers") or 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Video processing job workers")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--db", default=JOBS_DB)
+    args = parser.parse_args()
+
+    pool = WorkerPool(args.concurrency or default_concurrency(), args.db).start()
+    print(f"{pool.concurrency} job worker(s) on {args.db}")
+    try:
+        for proc in pool.processes:
+            proc.join()
+    except KeyboardInterrupt:
+        pool.stop()
@@ -0,0 +1,254 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# ======================================================
+# PROCESS-WIDE MODEL REGISTRY
+# ======================================================
+# YOLO weights and the DeepSORT appearance embedder are loaded once per
+# process (per configuration) and warmed with a dummy inference, so only
+# the first upload pays model load and first-inference latency.
+# Trackers hold per-video state and are always created fresh per run.
+# With TRAFFIC_INFERENCE_ADDRESS set, detection goes to the local inference
+# daemon (backend.daemon) instead and no YOLO copy is loaded here.
+
+VEHICLE_CLASSES = ["car", "bus", "truck", "motorcycle"]
+MIN_CONF = 0.25                 # ultralytics default, made explicit
+
+_LOCK = threading.Lock()
+_DETECTORS = {}
+_EMBEDDERS = {}
+_CLASS_IDS = {}
+_REMOTE = {}
+
+
+def get_detector(weights="yolov8n.pt", warmup_size=(288, 512)):
+    """Warm detector for `weights`: the daemon client if configured, else local."""
+    address = os.environ.get("TRAFFIC_INFERENCE_ADDRESS")
+    if not address:
+        return load_detector(weights, warmup_size)
+
+    with _LOCK:
+        client = _REMOTE.get((address, weights))
+        if client is None:
+            from backend.daemon import RemoteDetector
+
+            client = RemoteDetector(address, weights)
+            _REMOTE[(address, weights)] = client
+
+    return client
+
+
+def load_detector(weights="yolov8n.pt", warmup_size=(288, 512)):
+    """Return a warm in-process YOLO model for `weights`, loading it on first use."""
+    key = (weights, tuple(warmup_size))
+
+    with _LOCK:
+        model = _DETECTORS.get(key)
+        if model is None:
+            from ultralytics import YOLO
+
+            # .pt, exported .onnx or *_openvino_model/ (see backend.export)
+            model = YOLO(weights, task="detect")
+            dummy = np.zeros((warmup_size[0], warmup_size[1], 3), dtype=np.uint8)
+            model(dummy, verbose=False)
+            _DETECTORS[key] = model
+
+    return model
+
+
+def get_embedder(half=True, bgr=True, gpu=True):
+    """Return a warm MobileNetV2 embedder shared by all DeepSORT runs."""
+    key = (half, bgr, gpu)
+
+    with _LOCK:
+        embedder = _EMBEDDERS.get(key)
+        if embedder is None:
+            from deep_sort_realtime.embedder.embedder_pytorch import (
+                MobileNetv2_Embedder,
+            )
+
+            embedder = MobileNetv2_Embedder(
+                half=half, max_batch_size=64, bgr=bgr, gpu=gpu
+            )
+            embedder.predict([np.zeros((128, 64, 3), dtype=np.uint8)])
+            _EMBEDDERS[key] = embedder
+
+    return embedder
+
+
+def new_tracker(max_age=30, n_init=3, max_iou_distance=0.7,
+                half=True, bgr=True, gpu=True):
+    """Fresh DeepSORT tracker for one run, backed by the shared embedder."""
+    from deep_sort_realtime.deepsort_tracker import DeepSort
+
+    tracker = DeepSort(
+        max_age=max_age,
+        n_init=n_init,
+        max_iou_distance=max_iou_distance,
+        embedder=None,
+    )
+    tracker.embedder = get_embedder(half=half, bgr=bgr, gpu=gpu)
+    return tracker
+
+
+def preload(weights="yolov8n.pt"):
+    """Load and warm the default detector and embedder ahead of the first run."""
+    get_detector(weights)
+    get_embedder()
+
+
+# ======================================================
+# BATCHED INFERENCE
+# ======================================================
+class BatchSizer:
+    """Caps the detector batch so a single call stays inside a latency budget."""
+
+    def __init__(self, max_batch=4, latency_budget_ms=500):
+        self.max_batch = max(1, int(max_batch))
+        self.latency_budget_ms = latency_budget_ms
+        self.per_frame_ms = None
+
+    @property
+    def size(self):
+        if self.latency_budget_ms is None:
+            return self.max_batch
+        if self.per_frame_ms is None:
+            return 1                    # measure one frame before batching
+
+        fit = int(self.latency_budget_ms // max(self.per_frame_ms, 1e-3))
+        return max(1, min(self.max_batch, fit))
+
+    def record(self, n_frames, elapsed_s):
+        ms = elapsed_s * 1000.0 / n_frames
+        if self.per_frame_ms is None:
+            self.per_frame_ms = ms
+        else:
+            self.per_frame_ms = 0.8 * self.per_frame_ms + 0.2 * ms
+
+
+def run_batch(model, frames, sizer=None, imgsz=None):
+    """Run the detector once on a list of frames, one result per frame.
+
+    Class and confidence filtering happen inside the model call, so only
+    vehicle boxes come back. `imgsz` overrides the model's input size.
+    """
+    kwargs = {} if imgsz is None else {"imgsz": imgsz}
+
+    start = time.perf_counter()
+    results = model(
+        list(frames),
+        verbose=False,
+        classes=vehicle_class_ids(model),
+        conf=MIN_CONF,
+        **kwargs,
+    )
+    if sizer is not None:
+        sizer.record(len(frames), time.perf_counter() - start)
+    return results
+
+
+def detect_batches(model, frames, sizer, image=None, select=None, imgsz=None):
+    """Yield (frame, result) pairs in input order, inferring in batches.
+
+    `image(frame)` extracts the array to infer on when frames carry metadata.
+    `select(frame)` is called once per frame in order; frames it rejects are
+    passed through with a `None` result and do not count towards the batch.
+    """
+    batch = []
+    wanted = 0
+
+    def flush():
+        chosen = [f for f, keep in batch if keep]
+        images = chosen if image is None else [image(f) for f in chosen]
+        results = iter(run_batch(model, images, sizer, imgsz) if images else [])
+        for frame, keep in batch:
+            yield frame, next(results) if keep else None
+
+    for frame in frames:
+        keep = select is None or select(frame)
+        batch.append((frame, keep))
+        wanted += keep
+        if wanted >= sizer.size:
+            yield from flush()
+            batch = []
+            wanted = 0
+
+    if batch:
+        yield from flush()
+
+
+# ======================================================
+# DETECTION ADAPTER
+# ======================================================
+# One NumPy pull of xyxy/conf/cls per frame plus mask filtering, instead of
+# per-box tensor indexing and name lookups.
+
+Detections = namedtuple("Detections", ["xyxy", "conf", "cls"])
+
+
+def vehicle_class_ids(model):
+    ids = _CLASS_IDS.get(id(model))
+    if ids is None:
+        ids = [i for i, name in model.names.items() if name in VEHICLE_CLASSES]
+        _CLASS_IDS[id(model)] = ids
+    return ids
+
+
+def _as_numpy(values):
+    if hasattr(values, "cpu"):
+        return values.cpu().numpy()
+    return np.asarray(values)
+
+
+def extract_detections(result, class_ids=None, min_conf=MIN_CONF, mapping=None):
+    """Integer xyxy (n, 4), conf (n,) and cls (n,) arrays for one result.
+
+    `mapping(xyxy)` maps float boxes into frame pixels before rounding, for
+    results from a cropped or rescaled detector input.
+    """
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return Detections(
+            np.zeros((0, 4), dtype=int),
+            np.zeros(0, dtype=np.float32),
+            np.zeros(0, dtype=int),
+        )
+
+    xyxy = _as_numpy(boxes.xyxy)
+    if mapping is not None:
+        xyxy = mapping(xyxy)
+    xyxy = xyxy.astype(int)
+    conf = _as_numpy(boxes.conf)
+    cls = _as_numpy(boxes.cls).astype(int)
+
+    mask = conf >= min_conf
+    if class_ids is not None:
+        mask &= np.isin(cls, class_ids)
+
+    return Detections(xyxy[mask], conf[mask], cls[mask])
+
+
+def deepsort_detections(dets, names):
+    """([l, t, w, h], conf, name) tuples as DeepSORT.update_tracks expects.
+
+    Zero-width or zero-height boxes are dropped here: DeepSORT would skip
+    them but not their embeddings, and they have no crop to embed.
+    """
+    ltwh = dets.xyxy.copy()
+    ltwh[:, 2:] -= ltwh[:, :2]
+    keep = (ltwh[:, 2] > 0) & (ltwh[:, 3] > 0)
+
+    return [
+        (box, conf, names[cls])
+        for box, conf, cls in zip(ltwh[keep].tolist(), dets.conf[keep].tolist(),
+                                  dets.cls[keep].tolist())
+    ]
+
+
+def vehicle_detections(model, result, mapping=None):
+    """Vehicle `Detections` arrays for one detector result."""
+    return extract_detections(result, vehicle_class_ids(model), mapping=mapping)
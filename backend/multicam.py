@@ -0,0 +1,260 @@
+import os
+import queue
+import threading
+
+import cv2
+
+from backend.models import BatchSizer, get_detector, run_batch, vehicle_detections
+from backend.pipeline import _DONE, _POLL_S, _drain, _put, _Stopped
+from backend.process_video import (
+    FRAME_SKIP,
+    PREVIEW_EVERY,
+    RESIZE_HEIGHT,
+    RESIZE_WIDTH,
+    camera_analytics,
+    new_run,
+    setup_camera,
+    write_summary,
+)
+from backend.realtime import RealtimeSource
+from backend.replay import TrackLog
+from backend.run_store import FLUSH_ROWS, MetricsWriter
+from backend.trackers import make_tracker
+from backend.tuning import apply_tuning
+from src.video_loader import FrameSource
+
+# ======================================================
+# MULTI-CAMERA ENGINE
+# ======================================================
+# Several sources in one process around ONE detector. Every camera keeps its
+# own geometry, zones, tracker, rules and history run; only the YOLO model
+# (and the DeepSORT embedder, via the model registry) is shared, so memory
+# grows with the number of cameras through tracker state alone.
+#
+#   reader thread per camera  -> pending queue (decoded frames)
+#   scheduler (caller thread) -> one detector call over frames from several
+#                                cameras, taken round-robin one per camera
+#                                per pass, starting camera rotating per batch
+#   tracker thread per camera -> tracking, rules, CSV and preview
+#
+# Bounded queues give per-camera backpressure: a camera whose tracker falls
+# behind (its `detected` queue is full) stops being scheduled instead of
+# blocking the scheduler and starving the others.
+
+
+class Camera:
+    """One source's tracker, rules and history run inside the shared engine."""
+
+    def __init__(self, name, source, model, zones=None, frame_size=None,
+                 resize_mode=None, tracker_backend="deepsort", embed_every=1,
+                 realtime=False, max_latency_ms=500, queue_size=4):
+        self.name = name
+        self.model = model
+        self.realtime = realtime
+
+        self.source = FrameSource(source, frame_skip=FRAME_SKIP)
+        self.geometry = setup_camera(self.source, zones, frame_size, resize_mode)
+        self.stream = self.source
+        if realtime:
+            self.stream = RealtimeSource(self.source, max_latency_ms=max_latency_ms)
+
+        self.tracker = make_tracker(tracker_backend, model.names, max_age=30,
+                                    embed_every=embed_every)
+        self.analytics = camera_analytics(zones, self.geometry)
+        self.run_id, self.run_dir = new_run(name)
+        self.track_log = TrackLog(self.geometry, zones, run_dir=self.run_dir)
+
+        self.pending = queue.Queue(maxsize=queue_size)     # awaiting detection
+        self.detected = queue.Queue(maxsize=queue_size)    # awaiting tracking
+        self.exhausted = False
+
+    # ================= READER =================
+    def read(self, stop, ready):
+        for frame in self.stream:
+            _put(self.pending, frame, stop)
+            ready.set()
+        _put(self.pending, _DONE, stop)
+        ready.set()
+
+    # ================= TRACKING + OUTPUT =================
+    def track(self, stop, ready):
+        last_index = None
+        preview_path = os.path.join(self.run_dir, "latest_frame.jpg")
+
+        metrics = MetricsWriter(self.run_dir, self.analytics.header(),
+                                flush_rows=1 if self.realtime else FLUSH_ROWS)
+        try:
+            for source_frame, result in _drain(self.detected, stop):
+                ready.set()                 # room in `detected` again
+                frame = source_frame.image
+
+                step = 1
+                if self.realtime and last_index is not None:
+                    step = (source_frame.index - last_index) / FRAME_SKIP
+                last_index = source_frame.index
+
+                detections = vehicle_detections(self.model, result)
+                boxes = self.tracker.update(detections, frame)
+                alive = self.tracker.alive_ids()
+                self.analytics.retain(alive)
+
+                row = self.analytics.update(boxes, step=step)
+                self.track_log.add(source_frame.index, step, boxes, detections, alive)
+                metrics.write(row, source_frame.timestamp)
+
+                if row[0] % PREVIEW_EVERY == 0:
+                    for _, l, t_, r, b in boxes:
+                        cv2.rectangle(frame, (l, t_), (r, b), (0, 255, 0), 2)
+                    cv2.imwrite(preview_path, frame)
+        finally:
+            metrics.close()
+            self.track_log.save()
+
+    def finish(self):
+        extra = {
+            "camera": self.name,
+            "tracker": self.tracker.stats(),
+            **self.geometry.describe(),
+        }
+        if self.realtime:
+            extra["realtime"] = self.stream.stats()
+        write_summary(self.run_id, self.run_dir, self.analytics, extra)
+
+    def release(self):
+        self.stream.release()
+
+
+class MultiCameraEngine:
+    """Shared-detector engine over {name: source or camera options}."""
+
+    def __init__(self, cameras, weights="yolov8n.pt", batch_size=8,
+                 batch_latency_ms=None, queue_size=4, **camera_defaults):
+        apply_tuning()
+        self.model = get_detector(weights, (RESIZE_HEIGHT, RESIZE_WIDTH))
+        self.sizer = BatchSizer(batch_size, batch_latency_ms)
+        self._turn = 0
+
+        self.cameras = []
+        try:
+            for name, spec in cameras.items():
+                options = dict(camera_defaults, queue_size=queue_size)
+                if isinstance(spec, dict):
+                    options.update(spec)
+                    source = options.pop("source")
+                else:
+                    source = spec
+                self.cameras.append(Camera(name, source, self.model, **options))
+        except BaseException:
+            self.release()
+            raise
+
+    # ================= FAIR SCHEDULING =================
+    def _next_batch(self):
+        """Up to `sizer.size` frames, one per ready camera per pass.
+
+        Returns (batch, finished): cameras whose tracker has no room left in
+        `detected` are skipped, and cameras that reached the end are only
+        marked finished, so their end marker follows their last results.
+        """
+        batch, finished, taken = [], [], {}
+        n = len(self.cameras)
+        start, self._turn = self._turn, (self._turn + 1) % max(n, 1)
+
+        while len(batch) < self.sizer.size:
+            took = False
+            for k in range(n):
+                cam = self.cameras[(start + k) % n]
+                if cam.exhausted:
+                    continue
+                if cam.detected.qsize() + taken.get(cam.name, 0) >= cam.detected.maxsize:
+                    continue
+                try:
+                    item = cam.pending.get_nowait()
+                except queue.Empty:
+                    continue
+
+                if item is _DONE:
+                    cam.exhausted = True
+                    finished.append(cam)
+                    continue
+
+                batch.append((cam, item))
+                taken[cam.name] = taken.get(cam.name, 0) + 1
+                took = True
+                if len(batch) >= self.sizer.size:
+                    break
+            if not took:
+                break
+
+        return batch, finished
+
+    def _schedule(self, stop, ready):
+        while not stop.is_set():
+            ready.clear()
+            batch, finished = self._next_batch()
+            if batch:
+                results = run_batch(self.model, [f.image for _, f in batch], self.sizer)
+                for (cam, frame), result in zip(batch, results):
+                    _put(cam.detected, (frame, result), stop)
+            for cam in finished:
+                _put(cam.detected, _DONE, stop)
+
+            if not batch and not finished:
+                if all(cam.exhausted for cam in self.cameras):
+                    return
+                ready.wait(_POLL_S)
+
+    # ================= RUN =================
+    def run(self):
+        """Process every camera to the end; returns {name: run_dir}."""
+        stop = threading.Event()
+        ready = threading.Event()
+        errors = []
+
+        def guarded(fn, *args):
+            def worker():
+                try:
+                    fn(*args)
+                except _Stopped:
+                    pass
+                except BaseException as exc:
+                    errors.append(exc)
+                    stop.set()
+            return worker
+
+        threads = []
+        for cam in self.cameras:
+            threads.append(threading.Thread(
+                target=guarded(cam.read, stop, ready),
+                name=f"camera-{cam.name}-read", daemon=True,
+            ))
+            threads.append(threading.Thread(
+                target=guarded(cam.track, stop, ready),
+                name=f"camera-{cam.name}-track", daemon=True,
+            ))
+        for t in threads:
+            t.start()
+
+        try:
+            guarded(self._schedule, stop, ready)()
+            for t in threads:
+                t.join()
+        finally:
+            stop.set()
+            self.release()
+
+        if errors:
+            raise errors[0]
+
+        for cam in self.cameras:
+            cam.finish()
+        return {cam.name: cam.run_dir for cam in self.cameras}
+
+    def release(self):
+        for cam in self.cameras:
+            cam.release()
+
+
+def process_cameras(cameras, **kwargs):
+    """Run several cameras through one shared detector; {name: run_dir}."""
+    return MultiCameraEngine(cameras, **kwargs).run()
@@ -0,0 +1,99 @@
+import queue
+import threading
+
+# ======================================================
+# STAGED PIPELINE
+# ======================================================
+# Each stage is a generator function `stage(items) -> items` running on its
+# own thread; stages are connected by bounded queues, so a slow stage applies
+# backpressure upstream instead of letting frames pile up in memory.
+# The sink consumes the final stream. Order is preserved end to end because
+# every stage is a single FIFO worker.
+
+_DONE = object()
+_POLL_S = 0.1
+
+
+class _Stopped(Exception):
+    pass
+
+
+def _put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_S)
+            return
+        except queue.Full:
+            continue
+    raise _Stopped()
+
+
+def _drain(q, stop):
+    while True:
+        try:
+            item = q.get(timeout=_POLL_S)
+        except queue.Empty:
+            if stop.is_set():
+                raise _Stopped()
+            continue
+
+        if item is _DONE:
+            return
+        yield item
+
+
+def run_pipeline(source, stages, sink, queue_size=8, threaded=True):
+    """Feed `source` through `stages` into `sink`, one worker per step."""
+    if not threaded:
+        items = source
+        for stage in stages:
+            items = stage(items)
+        sink(items)
+        return
+
+    stop = threading.Event()
+    errors = []
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+
+    def guarded(fn):
+        def worker():
+            try:
+                fn()
+            except _Stopped:
+                pass
+            except BaseException as exc:
+                errors.append(exc)
+                stop.set()
+        return worker
+
+    def produce():
+        for item in source:
+            _put(queues[0], item, stop)
+        _put(queues[0], _DONE, stop)
+
+    def transform(stage, q_in, q_out):
+        def fn():
+            for item in stage(_drain(q_in, stop)):
+                _put(q_out, item, stop)
+            _put(q_out, _DONE, stop)
+        return fn
+
+    def consume():
+        sink(_drain(queues[-1], stop))
+
+    workers = [guarded(produce)]
+    for i, stage in enumerate(stages):
+        workers.append(guarded(transform(stage, queues[i], queues[i + 1])))
+    workers.append(guarded(consume))
+
+    threads = [
+        threading.Thread(target=w, name=f"pipeline-{i}", daemon=True)
+        for i, w in enumerate(workers)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    if errors:
+        raise errors[0]
@@ -1,146 +1,349 @@
-def process_video(video_path):
-    import cv2
-    import csv
-    import math
-    import os
-    import json
-    from datetime import datetime
-    from ultralytics import YOLO
-    from deep_sort_realtime.deepsort_tracker import DeepSort
-
-    # ================= MODEL INIT (INSIDE FUNCTION) =================
-    model = YOLO("yolov8n.pt")
-    tracker = DeepSort(max_age=30)
+import itertools
+import json
+import os
+import shutil
+from datetime import datetime
+
+import cv2
+
+from backend.analytics import TrafficAnalytics
+from backend.export import exported_path
+from backend.ingest import still_writing
+from backend.models import (
+    BatchSizer,
+    detect_batches,
+    get_detector,
+    vehicle_detections,
+)
+from backend.pipeline import run_pipeline
+from backend.propagation import make_propagator
+from backend.realtime import RealtimeSource
+from backend.replay import TrackLog
+from backend.resolution import camera_geometry
+from backend.roi import RoiWindow
+from backend.run_store import FLUSH_ROWS, MetricsWriter
+from backend.sampling import STOP_BAND, MotionSampler
+from backend.trackers import make_tracker
+from backend.tuning import apply_tuning
+from backend.zones import ZoneMap, load_zone_config
+from src.video_loader import FrameSource
+
+# ================= CONFIG (OPTIMIZED) =================
+FRAME_SKIP = 4                      # faster than 3
+ADAPTIVE_SKIP = 2                   # candidate spacing for adaptive sampling
+RESIZE_WIDTH, RESIZE_HEIGHT = 512, 288
+
+HISTORY_DIR = "history"
+LIVE_FRAME_PATH = "latest_frame.jpg"
+PREVIEW_EVERY = 10                  # rows between preview saves (1 in real time)
+
 
 # ======================================================
-# MAIN FUNCTION
+# ZONES
 # ======================================================
-def process_video(video_path):
-    # ================= CONFIG (OPTIMIZED) =================
-    FRAME_SKIP = 4                      # faster than 3
-    RESIZE_WIDTH, RESIZE_HEIGHT = 512, 288
-    SPEED_THRESHOLD = 30
-
-    QUEUE_X1, QUEUE_Y1 = 100, 200
-    QUEUE_X2, QUEUE_Y2 = 500, 450
-    STOP_LINE_Y = 300
-
-    # ================= HISTORY =================
-    run_id = datetime.now().strftime("run_%Y%m%d_%H%M%S")
-    run_dir = os.path.join("history", run_id)
-    os.makedirs(run_dir, exist_ok=True)
-
-    output_csv = os.path.join(run_dir, "traffic_log.csv")
-    summary_path = os.path.join(run_dir, "summary.json")
-    live_frame_path = "latest_frame.jpg"
-
-    cap = cv2.VideoCapture(video_path)
-
-    raw_frame_id = 0
-    processed_frame_id = 0
-
-    seen = set()
-    violated = set()
-    rash = set()
-    prev_pos = {}
-    prev_center = {}
-
-    # ================= CSV SETUP =================
-    with open(output_csv, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            "frame",
-            "queue_count",
-            "red_light_violations",
-            "rash_driving",
-            "total_vehicles"
-        ])
-
-        # ================= MAIN LOOP =================
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            raw_frame_id += 1
-            if raw_frame_id % FRAME_SKIP != 0:
-                continue
-
-            processed_frame_id += 1
-
-            frame = cv2.resize(frame, (RESIZE_WIDTH, RESIZE_HEIGHT))
-
-            results = MODEL(frame, verbose=False)
-            detections = []
-
-            # -------- YOLO DETECTIONS --------
-            for box in results[0].boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                cls = int(box.cls[0])
-                name = MODEL.names[cls]
-                conf = float(box.conf[0])
-
-                if name in ["car", "bus", "truck", "motorcycle"]:
-                    detections.append(([x1, y1, x2 - x1, y2 - y1], conf, name))
-
-            tracks = TRACKER.update_tracks(detections, frame=frame)
-            queue_count = 0
-
-            for t in tracks:
-                if not t.is_confirmed():
-                    continue
-
-                tid = t.track_id
-                l, t_, w, h = map(int, t.to_ltrb())
-                cx, cy = l + w // 2, t_ + h // 2
-
-                seen.add(tid)
-
-                # -------- RED-LIGHT VIOLATION --------
-                py = prev_pos.get(tid)
-                prev_pos[tid] = cy
-                if py is not None and py < STOP_LINE_Y <= cy:
-                    violated.add(tid)
-
-                # -------- RASH DRIVING --------
-                pc = prev_center.get(tid)
-                prev_center[tid] = (cx, cy)
-                if pc and math.dist(pc, (cx, cy)) > SPEED_THRESHOLD:
-                    rash.add(tid)
-
-                # -------- QUEUE COUNT --------
-                if QUEUE_X1 <= cx <= QUEUE_X2 and QUEUE_Y1 <= cy <= QUEUE_Y2:
-                    queue_count += 1
-
-                # -------- DRAW (LIVE PREVIEW) --------
-                cv2.rectangle(frame, (l, t_), (l + w, t_ + h), (0, 255, 0), 2)
+def zone_config(zones):
+    """Zone config dict from a path or dict (None and ZoneMap pass through)."""
+    if isinstance(zones, str):
+        return load_zone_config(zones)
+    return zones
 
-            # Save live preview frame
-            if processed_frame_id % 10 == 0:
-                cv2.imwrite(live_frame_path, frame)
 
-            # -------- CSV LOG --------
-            writer.writerow([
-                processed_frame_id,
-                queue_count,
-                len(violated),
-                len(rash),
-                len(seen)
-            ])
+def compile_zones(zones, geometry):
+    """ZoneMap in `geometry`'s processing pixels; None keeps the legacy rules."""
+    zones = zone_config(zones)
+    if zones is None or isinstance(zones, ZoneMap):
+        return zones
+    return ZoneMap(geometry.project_zones(zones), geometry.size)
 
-    cap.release()
 
-    # ================= SUMMARY =================
+def camera_analytics(zones, geometry, **overrides):
+    """TrafficAnalytics with the rule constants rescaled to `geometry`."""
+    rules = geometry.legacy_rules(**overrides)
+    return TrafficAnalytics(
+        stop_line_y=rules["stop_line_y"],
+        speed_threshold=rules["speed_threshold"],
+        queue_box=rules["queue_box"],
+        zones=compile_zones(zones, geometry),
+        frame_size=geometry.size,
+        origin=(geometry.ox, geometry.oy),
+    )
+
+
+def setup_camera(source, zones=None, frame_size=None, resize_mode=None):
+    """Per-camera geometry for an open FrameSource, which it then resizes with."""
+    config = zone_config(zones)
+    geometry = camera_geometry(
+        source.resolution,
+        config if isinstance(config, dict) else None,
+        frame_size,
+        resize_mode,
+        default_size=(RESIZE_WIDTH, RESIZE_HEIGHT),
+    )
+    source.transform = geometry.apply
+    return geometry
+
+
+# ======================================================
+# RUN OUTPUT
+# ======================================================
+def new_run(label=None):
+    """Fresh history/<run_id>; microsecond IDs, never an existing dir."""
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    while True:
+        run_id = datetime.now().strftime("run_%Y%m%d_%H%M%S_%f")
+        if label:
+            run_id = f"{run_id}_{label}"
+        run_dir = os.path.join(HISTORY_DIR, run_id)
+        try:
+            os.makedirs(run_dir, exist_ok=False)
+        except FileExistsError:
+            continue        # another worker took this microsecond
+        return run_id, run_dir
+
+
+def discard_run(run_dir):
+    """Remove an incomplete history run."""
+    shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def write_summary(run_id, run_dir, analytics, extra=None):
     summary = {
         "run_id": run_id,
         "processed_at": datetime.now().isoformat(),
-        "total_vehicles": len(seen),
-        "red_light_violations": len(violated),
-        "rash_driving": len(rash),
-        "frames_processed": processed_frame_id
+        **analytics.summary(),
+        **(extra or {})
     }
 
-    with open(summary_path, "w") as f:
+    with open(os.path.join(run_dir, "summary.json"), "w") as f:
         json.dump(summary, f, indent=4)
 
+    return summary
+
+
+# ======================================================
+# MAIN FUNCTION
+# ======================================================
+def process_video(video_path, weights="yolov8n.pt",
+                  batch_size=4, batch_latency_ms=500,
+                  pipelined=True, queue_size=None, target_fps=None,
+                  adaptive=False, detect_every=1, propagate="kalman",
+                  tracker_backend="deepsort", embed_every=1, zones=None,
+                  roi=False, roi_margin=32, roi_native=False,
+                  frame_size=None, resize_mode=None,
+                  realtime=False, max_latency_ms=500, drop_policy="newest",
+                  keep_every=4, stop_event=None, max_duration_s=None,
+                  detector_backend="torch", int8=False, progress=None):
+    # Thread counts and queue size tuned for this machine (python -m
+    # backend.tuning)
+    tuning = apply_tuning()
+    queue_size = queue_size or (tuning or {}).get("queue_size") or 8
+
+    # Every FRAME_SKIP-th frame, or a fixed rate in time when target_fps is set.
+    # Adaptive mode decodes candidates twice as often and lets MotionSampler
+    # pick between every candidate and every 8th one. An upload that is
+    # still being ingested is followed until its last chunk is on disk.
+    source = FrameSource(
+        video_path,
+        frame_skip=ADAPTIVE_SKIP if adaptive else FRAME_SKIP,
+        target_fps=target_fps,
+        keep_native=roi and roi_native,
+        follow=still_writing(video_path),
+    )
+
+    # Processing size and resize mode per camera (arguments, then the zone
+    # config, then RESIZE_WIDTH x RESIZE_HEIGHT stretched).
+    geometry = setup_camera(source, zones, frame_size, resize_mode)
+    size = geometry.size
+
+    # ================= MODEL INIT (CACHED PER PROCESS) =================
+    # ONNX / OpenVINO backends load the model exported by backend.export
+    weights = exported_path(weights, detector_backend, int8)
+    if not os.path.exists(weights) and detector_backend != "torch":
+        raise FileNotFoundError(
+            f"No {detector_backend} model at {weights}; "
+            "run `python -m backend.export export` first"
+        )
+    model = get_detector(weights, (size[1], size[0]))
+    tracker = make_tracker(tracker_backend, model.names, max_age=30,
+                           embed_every=embed_every)
+    sizer = BatchSizer(batch_size, batch_latency_ms)
+
+    # Real-time mode: freshest frames only, one frame per detector call and
+    # single-slot queues, so nothing waits behind stale work. A live feed is
+    # ended by setting `stop_event` or after `max_duration_s`, and the run
+    # is then finished and summarised like a file.
+    stream = source
+    if realtime:
+        stream = RealtimeSource(source, max_latency_ms=max_latency_ms,
+                                policy=drop_policy, keep_every=keep_every,
+                                stop_event=stop_event,
+                                max_duration_s=max_duration_s)
+        sizer = BatchSizer(1, None)
+        queue_size = 1
+
+    analytics = camera_analytics(zones, geometry)
+
+    # ROI mode: the detector only sees the window around the zones (taken
+    # from the native frame with roi_native) and boxes are mapped back.
+    window = None
+    if roi:
+        window = RoiWindow(
+            analytics.zones.regions(STOP_BAND),
+            size,
+            margin=roi_margin,
+            geometry=geometry if roi_native else None,
+        )
+
+    stages = []
+
+    # ================= STAGE: MOTION GATE (OPTIONAL) =================
+    if adaptive:
+        sampler = MotionSampler(
+            size,
+            analytics.zones.regions(STOP_BAND),
+            min_interval=1,
+            max_interval=8,
+        )
+
+        def sample(frames):
+            return sampler(frames, image=lambda f: f.image)
+
+        stages.append(sample)
+
+    # ================= STAGE: DETECTION =================
+    # Detector runs on every `detect_every`-th sampled frame; the rest are
+    # carried forward by the propagator in the tracking stage.
+    sampled = itertools.count()
+    propagator = make_propagator(propagate, tracker)
+
+    def select(_):
+        return next(sampled) % detect_every == 0
+
+    def detect(frames):
+        return detect_batches(
+            model, frames, sizer,
+            image=window.crop if window else (lambda f: f.image),
+            select=select if detect_every > 1 else None,
+            imgsz=window.imgsz if window else None,
+        )
+
+    # ================= STAGE: TRACKING + ANALYTICS =================
+    def track(detected):
+        last_index = None
+
+        for source_frame, result in detected:
+            frame = source_frame.image
+
+            # Rash-driving displacement is per FRAME_SKIP raw frames; any
+            # sampling other than every FRAME_SKIP-th frame has uneven gaps
+            step = 1
+            sampled = adaptive or realtime or target_fps is not None
+            if sampled and last_index is not None:
+                step = (source_frame.index - last_index) / FRAME_SKIP
+            last_index = source_frame.index
+
+            detections = alive = None
+            if result is None:
+                boxes = propagator.step(frame)
+            else:
+                detections = vehicle_detections(
+                    model, result, mapping=window.to_frame if window else None
+                )
+                boxes = tracker.update(detections, frame)
+                propagator.reset(frame, boxes)
+
+                # The tracker has dropped every track it no longer holds
+                alive = tracker.alive_ids()
+                analytics.retain(alive)
+
+            row = analytics.update(boxes, step=step)
+
+            # -------- DRAW (LIVE PREVIEW) --------
+            for _, l, t_, w, h in boxes:
+                cv2.rectangle(frame, (l, t_), (l + w, t_ + h), (0, 255, 0), 2)
+
+            yield source_frame, row, (step, boxes, detections, alive)
+
+    # ================= STAGE: OUTPUT (METRICS + PREVIEW) =================
+    # Rows go to the run's columnar metrics store in batches (traffic_log.csv
+    # is exported when it closes). In real time each row also records the
+    # frames dropped so far and its arrival-to-output lag, and is committed
+    # at once so the Live page sees it. The track log row is written here
+    # too, so it is complete (latency included) and only this thread owns it.
+    # `progress(position, total)` gets raw frames read so far and the source's
+    # frame count (None for live); raising from it cancels the run.
+    preview_every = 1 if realtime else PREVIEW_EVERY
+    total_frames = source.frame_count
+
+    def output(rows):
+        header = analytics.header()
+        if realtime:
+            header += ["dropped_frames", "lag_ms"]
+        metrics = MetricsWriter(run_dir, header,
+                                flush_rows=1 if realtime else FLUSH_ROWS)
+
+        try:
+            for source_frame, row, (step, boxes, detections, alive) in rows:
+                # Save live preview frame
+                if row[0] % preview_every == 0:
+                    cv2.imwrite(LIVE_FRAME_PATH, source_frame.image)
+
+                dropped = lag = None
+                if realtime:
+                    dropped, lag = stream.dropped, stream.lag_ms(source_frame.index)
+                    row = row + [dropped, lag]
+
+                metrics.write(row, source_frame.timestamp)
+                track_log.add(source_frame.index, step, boxes, detections, alive,
+                              dropped=dropped, lag_ms=lag)
+
+                if progress is not None:
+                    progress(source_frame.index + 1, total_frames)
+        finally:
+            metrics.close()
+
+    # ================= RUN =================
+    # The history run only exists once processing starts, and is removed
+    # again if it fails or is cancelled, so history/ never holds a run
+    # without summary.json. The track log keeps boxes per row for
+    # re-analysis with other rules (backend.replay).
+    run_id, run_dir = new_run()
+    completed = False
+    try:
+        track_log = TrackLog(geometry, zones, realtime=realtime, run_dir=run_dir)
+        try:
+            run_pipeline(
+                stream,
+                stages + [detect, track],
+                output,
+                queue_size=queue_size,
+                threaded=pipelined,
+            )
+        finally:
+            track_log.save()
+        completed = True
+    finally:
+        stream.release()
+        if not completed:
+            discard_run(run_dir)
+
+    # ================= SUMMARY =================
+    extra = {
+        "detector": weights,
+        "tracker": tracker.stats(),
+        **geometry.describe(),
+    }
+    if tuning:
+        extra["threads"] = {k: tuning[k] for k in ("torch_threads", "cv2_threads")}
+    if realtime:
+        extra["realtime"] = stream.stats()
+    if window is not None:
+        extra["roi"] = {
+            "window": list(window.window),
+            "coverage": round(window.coverage, 3),
+            "native": window.native,
+            "imgsz": window.imgsz,
+        }
+    write_summary(run_id, run_dir, analytics, extra)
+
     return run_dir
@@ -0,0 +1,89 @@
+import cv2
+import numpy as np
+
+# ======================================================
+# TRACK PROPAGATION BETWEEN DETECTOR FRAMES
+# ======================================================
+# With detect-every-K, the detector only runs on every Kth sampled frame.
+# On the frames in between, confirmed tracks are carried forward so the
+# stop-line, speed and queue rules still see every sampled frame.
+#
+#   "kalman" - advance the tracker backend's own motion model by one step
+#   "flow"   - shift each box by the mean Lucas-Kanade flow of its corners
+#              and centre, measured against the previous sampled frame
+
+LK_PARAMS = dict(
+    winSize=(15, 15),
+    maxLevel=2,
+    criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+)
+
+
+class KalmanPropagator:
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+
+    def reset(self, frame, boxes):
+        pass
+
+    def step(self, frame):
+        return self.tracker.predict()
+
+
+class FlowPropagator:
+
+    def __init__(self):
+        self._gray = None
+        self._boxes = []
+
+    def reset(self, frame, boxes):
+        self._gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self._boxes = list(boxes)
+
+    def step(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        prev, self._gray = self._gray, gray
+
+        if prev is None or not self._boxes:
+            return list(self._boxes)
+
+        h, w = gray.shape
+        ids = [b[0] for b in self._boxes]
+        ltrb = np.array([b[1:] for b in self._boxes], dtype=np.float32)
+        l, t, r, b = ltrb.T
+
+        # corners + centre, clipped into the frame: (n, 5, 2)
+        pts = np.stack([
+            np.stack([l, t], axis=1),
+            np.stack([r, t], axis=1),
+            np.stack([l, b], axis=1),
+            np.stack([r, b], axis=1),
+            np.stack([(l + r) / 2, (t + b) / 2], axis=1),
+        ], axis=1)
+        pts[..., 0] = np.clip(pts[..., 0], 0, w - 1)
+        pts[..., 1] = np.clip(pts[..., 1], 0, h - 1)
+
+        p0 = pts.reshape(-1, 1, 2).astype(np.float32)
+        p1, status, _ = cv2.calcOpticalFlowPyrLK(prev, gray, p0, None, **LK_PARAMS)
+
+        ok = status.reshape(len(ids), 5, 1).astype(np.float32)
+        moved = (p1 - p0).reshape(len(ids), 5, 2) * ok
+        shift = moved.sum(axis=1) / np.maximum(ok.sum(axis=1), 1.0)
+
+        ltrb += np.concatenate([shift, shift], axis=1)
+        ltrb = np.rint(ltrb).astype(int)
+
+        self._boxes = [
+            (tid, int(l_), int(t_), int(r_), int(b_))
+            for tid, (l_, t_, r_, b_) in zip(ids, ltrb)
+        ]
+        return list(self._boxes)
+
+
+def make_propagator(kind, tracker):
+    if kind == "kalman":
+        return KalmanPropagator(tracker)
+    if kind == "flow":
+        return FlowPropagator()
+    raise ValueError(f"Unknown propagation mode: {kind}")
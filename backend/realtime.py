@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+# ======================================================
+# REAL-TIME SOURCE (LIVE STREAMS)
+# ======================================================
+# A reader thread pulls frames from a FrameSource as fast as they arrive and
+# stamps each with its arrival time. The pipeline takes the freshest frames
+# from a small buffer, so a slow detector drops frames instead of falling
+# further and further behind the stream.
+#
+#   "newest"    - always take the newest buffered frame, drop the rest
+#   "every_nth" - in order while within `max_latency_ms`; while behind, keep
+#                 the newest of every `keep_every` buffered frames
+#
+# File sources are paced to their own frame rate so they replay like a feed.
+# A live feed has no end, so iteration also ends cleanly when `stop_event`
+# is set or after `max_duration_s`; the pipeline then drains and the run
+# writes its summary as for a finished file.
+
+DROP_POLICIES = ("newest", "every_nth")
+LAG_WINDOW = 1000               # recent lags kept for the p95
+POLL_S = 0.1                    # stop / duration check while waiting
+READER_JOIN_S = 5
+
+
+class RealtimeSource:
+    """Freshest-frame iterator over a FrameSource read on its own thread."""
+
+    def __init__(self, source, max_latency_ms=500, policy="newest",
+                 keep_every=4, buffer_size=32, pace=None, stop_event=None,
+                 max_duration_s=None):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {policy}")
+
+        self.source = source
+        self.max_latency = max_latency_ms / 1000.0
+        self.policy = policy
+        self.keep_every = max(1, int(keep_every))
+        self.pace = source.kind != "live" if pace is None else pace
+        self.stop_event = stop_event or threading.Event()
+        self.max_duration = max_duration_s
+
+        self.delivered = 0
+        self.dropped = 0
+        self.lags_ms = deque(maxlen=LAG_WINDOW)
+        self._lag_total = 0.0
+        self._lag_count = 0
+
+        self._buffer = deque()
+        self._buffer_size = max(1, int(buffer_size))
+        self._cond = threading.Condition()
+        self._done = False
+        self._error = None
+        self._stop = threading.Event()
+        self._reader = None
+        self._arrived = OrderedDict()       # index -> arrival, delivered frames
+        self._arrived_lock = threading.Lock()
+
+    # ================= READER THREAD =================
+    def _read(self):
+        started = time.monotonic()
+        try:
+            for frame in self.source:
+                if self._stop.is_set():
+                    break
+                if self.pace:
+                    delay = started + frame.timestamp - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                with self._cond:
+                    if len(self._buffer) >= self._buffer_size:
+                        self._buffer.popleft()
+                        self.dropped += 1
+                    self._buffer.append((frame, time.monotonic()))
+                    self._cond.notify()
+        except BaseException as exc:
+            self._error = exc
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify()
+
+    def _take(self):
+        """Next frame per the drop policy; caller holds the lock."""
+        buf = self._buffer
+
+        if self.policy == "newest":
+            skip = len(buf) - 1
+        elif time.monotonic() - buf[0][1] > self.max_latency:
+            skip = min(self.keep_every, len(buf)) - 1
+        else:
+            skip = 0
+
+        for _ in range(skip):
+            buf.popleft()
+        self.dropped += skip
+        return buf.popleft()
+
+    def _ended(self, started):
+        if self.stop_event.is_set():
+            return True
+        return (self.max_duration is not None
+                and time.monotonic() - started >= self.max_duration)
+
+    def __iter__(self):
+        self._reader = reader = threading.Thread(target=self._read, daemon=True)
+        started = time.monotonic()
+        reader.start()
+
+        try:
+            while not self._ended(started):
+                with self._cond:
+                    while not self._buffer and not self._done:
+                        if self._ended(started):
+                            break
+                        self._cond.wait(POLL_S)
+                    if not self._buffer:
+                        break
+                    frame, arrived = self._take()
+
+                with self._arrived_lock:
+                    self._arrived[frame.index] = arrived
+                self.delivered += 1
+                yield frame
+        finally:
+            self._stop.set()
+            reader.join(timeout=READER_JOIN_S)
+
+        if self._error is not None:
+            raise self._error
+
+    # ================= LAG =================
+    def lag_ms(self, index):
+        """Arrival-to-now lag for a delivered frame, in milliseconds.
+
+        Also forgets older frames, which a later stage may have filtered out.
+        """
+        arrived = None
+        with self._arrived_lock:
+            while self._arrived:
+                first, stamp = next(iter(self._arrived.items()))
+                if first > index:
+                    break
+                self._arrived.popitem(last=False)
+                if first == index:
+                    arrived = stamp
+
+        if arrived is None:
+            return None
+        lag = (time.monotonic() - arrived) * 1000.0
+        self.lags_ms.append(lag)
+        self._lag_total += lag
+        self._lag_count += 1
+        return round(lag, 1)
+
+    def stats(self):
+        lags = sorted(self.lags_ms)
+        mean = self._lag_total / self._lag_count if self._lag_count else None
+        return {
+            "policy": self.policy,
+            "max_latency_ms": self.max_latency * 1000.0,
+            "frames_delivered": self.delivered,
+            "frames_dropped": self.dropped,
+            "lag_ms_mean": round(mean, 1) if mean is not None else None,
+            "lag_ms_p95": round(lags[int(0.95 * (len(lags) - 1))], 1) if lags else None,
+        }
+
+    def stop(self):
+        """End iteration cleanly after the frame in flight."""
+        self.stop_event.set()
+
+    def release(self):
+        # The reader may be inside grab(): let it return before the capture
+        # goes away under it
+        self._stop.set()
+        if self._reader is not None:
+            self._reader.join(timeout=READER_JOIN_S)
+        self.source.release()
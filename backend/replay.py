@@ -0,0 +1,291 @@
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+
+from backend.resolution import FrameGeometry
+from backend.run_store import MetricsWriter, has_metrics, load_columns
+from backend.zones import ZoneMap, load_zone_config
+
+# ======================================================
+# TRACK LOG + RE-ANALYSIS
+# ======================================================
+# Every run keeps what the detector and tracker produced in
+# history/<run_id>/tracks/, one raw binary file per column plus schema.json
+# (meta and dtypes). Rows are buffered and appended every FLUSH_ROWS rows,
+# so memory stays flat on 24-hour live feeds:
+#
+#   frames     index, step, detected, box_count, alive_count, det_count,
+#              [dropped, lag_ms]                            (one per row)
+#   boxes      box_id, box_ltrb                             (confirmed tracks)
+#   alive      alive_id                                     (tracker IDs held)
+#   detections det_xyxy, det_conf, det_cls                  (vehicle boxes)
+#
+# Track IDs are stored as integers (both trackers number them). The rule
+# layer is the only thing that depends on STOP_LINE_Y, the queue box,
+# SPEED_THRESHOLD or the zone config, so `reanalyze` replays the boxes
+# through a fresh TrafficAnalytics and writes its metrics, traffic_log.csv
+# and summary.json again without touching the video or the detector.
+#
+#   python -m backend.replay history/run_... --stop-line-y 280 --speed 25
+
+TRACKS_DIR = "tracks"
+SCHEMA_FILE = "schema.json"
+TRACKS_VERSION = 2
+FLUSH_ROWS = 256
+
+# column -> (dtype, values per row)
+COLUMNS = {
+    "index": (np.int64, 1),
+    "step": (np.float64, 1),
+    "detected": (np.bool_, 1),
+    "box_count": (np.int32, 1),
+    "alive_count": (np.int32, 1),
+    "det_count": (np.int32, 1),
+    "box_id": (np.int64, 1),
+    "box_ltrb": (np.int32, 4),
+    "alive_id": (np.int64, 1),
+    "det_xyxy": (np.int32, 4),
+    "det_conf": (np.float16, 1),
+    "det_cls": (np.int16, 1),
+}
+REALTIME_COLUMNS = {
+    "dropped": (np.int64, 1),
+    "lag_ms": (np.float64, 1),
+}
+
+
+class TrackLog:
+    """Per-frame detections and track boxes of one run, appended to disk."""
+
+    def __init__(self, geometry, zones=None, realtime=False, run_dir=None,
+                 flush_rows=FLUSH_ROWS):
+        self.meta = {
+            "version": TRACKS_VERSION,
+            "geometry": geometry.describe(),
+            "zones": _stored_zones(zones),
+            "rules": {},
+        }
+        self.columns = dict(COLUMNS, **(REALTIME_COLUMNS if realtime else {}))
+        self.flush_rows = max(1, int(flush_rows))
+        self.rows = 0
+
+        self._buffer = {name: [] for name in self.columns}
+        self._files = None
+        if run_dir is not None:
+            self.open(run_dir)
+
+    def open(self, run_dir):
+        self.dir = os.path.join(run_dir, TRACKS_DIR)
+        os.makedirs(self.dir, exist_ok=True)
+        self._files = {
+            name: open(os.path.join(self.dir, f"{name}.bin"), "wb")
+            for name in self.columns
+        }
+        _write_schema(self.dir, self.meta, self.columns)
+
+    def add(self, index, step, boxes, detections=None, alive=None,
+            dropped=None, lag_ms=None):
+        """One analytics row: its boxes and, on detector frames, the raw
+        detections and the tracker's alive IDs (None on propagated frames).
+        Real-time logs also take the row's dropped frames and lag."""
+        buf = self._buffer
+        buf["index"].append(index)
+        buf["step"].append(step)
+        buf["detected"].append(alive is not None)
+
+        buf["box_count"].append(len(boxes))
+        for track_id, *ltrb in boxes:
+            buf["box_id"].append(int(track_id))
+            buf["box_ltrb"].extend(ltrb)
+
+        alive = alive or ()
+        buf["alive_count"].append(len(alive))
+        buf["alive_id"].extend(int(t) for t in alive)
+
+        n = 0 if detections is None else len(detections.xyxy)
+        buf["det_count"].append(n)
+        if n:
+            buf["det_xyxy"].extend(np.asarray(detections.xyxy).ravel().tolist())
+            buf["det_conf"].extend(np.asarray(detections.conf).tolist())
+            buf["det_cls"].extend(np.asarray(detections.cls).tolist())
+
+        if "lag_ms" in buf:
+            buf["dropped"].append(dropped or 0)
+            buf["lag_ms"].append(np.nan if lag_ms is None else lag_ms)
+
+        self.rows += 1
+        if self._files is not None and len(buf["index"]) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        for name, (dtype, _) in self.columns.items():
+            values = self._buffer[name]
+            if values:
+                self._files[name].write(np.asarray(values, dtype=dtype).tobytes())
+                self._files[name].flush()
+                self._buffer[name] = []
+
+    def save(self, run_dir=None):
+        """Write what is buffered and close the column files."""
+        if self._files is None:
+            self.open(run_dir)
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        return self.dir
+
+
+def _write_schema(tracks_dir, meta, columns):
+    schema = dict(meta, columns={
+        name: [np.dtype(dtype).str, width] for name, (dtype, width) in columns.items()
+    })
+    with open(os.path.join(tracks_dir, SCHEMA_FILE), "w") as f:
+        json.dump(schema, f)
+
+
+def load_tracks(run_dir):
+    """(columns, meta) of a run's track log, with per-row offsets added."""
+    tracks_dir = os.path.join(run_dir, TRACKS_DIR)
+    with open(os.path.join(tracks_dir, SCHEMA_FILE)) as f:
+        meta = json.load(f)
+    if meta.get("version") != TRACKS_VERSION:
+        raise ValueError(f"Unsupported track log version: {meta.get('version')}")
+
+    columns = {}
+    for name, (dtype, width) in meta.pop("columns").items():
+        data = np.fromfile(os.path.join(tracks_dir, f"{name}.bin"), dtype=dtype)
+        columns[name] = data.reshape(-1, width) if width > 1 else data
+
+    for kind in ("box", "alive", "det"):
+        counts = columns[f"{kind}_count"].astype(np.int64)
+        columns[f"{kind}_offsets"] = np.concatenate([[0], np.cumsum(counts)])
+    return columns, meta
+
+
+# ======================================================
+# REPLAY
+# ======================================================
+def replay(columns, analytics):
+    """CSV rows of `analytics` over a loaded track log."""
+    box_off, alive_off = columns["box_offsets"], columns["alive_offsets"]
+    ids, ltrb, alive = columns["box_id"], columns["box_ltrb"], columns["alive_id"]
+    realtime = "lag_ms" in columns
+
+    for i, step in enumerate(columns["step"].tolist()):
+        # Same order as the live run: the tracker's prune, then the rules
+        if columns["detected"][i]:
+            analytics.retain(alive[alive_off[i]:alive_off[i + 1]].tolist())
+
+        lo, hi = box_off[i], box_off[i + 1]
+        row = analytics.update_arrays(ids[lo:hi].tolist(), ltrb[lo:hi], step=step)
+
+        if realtime:
+            lag = float(columns["lag_ms"][i])
+            row = row + [int(columns["dropped"][i]),
+                         None if np.isnan(lag) else round(lag, 1)]
+        yield row
+
+
+def _stored_zones(zones):
+    """JSON-safe form of a zone path, config or compiled ZoneMap."""
+    if isinstance(zones, str):
+        zones = load_zone_config(zones)
+    if isinstance(zones, ZoneMap):
+        return {"zone_map": zones.config, "size": list(zones.size)}
+    return zones
+
+
+def _run_zones(meta):
+    zones = meta["zones"]
+    if zones and "zone_map" in zones:
+        return ZoneMap(zones["zone_map"], zones["size"])
+    return zones
+
+
+def reanalyze(run_dir, zones=None, stop_line_y=None, queue_box=None,
+              speed_threshold=None, out_dir=None):
+    """Re-run the traffic rules of a finished run with new parameters.
+
+    `zones` replaces the run's zone config; the legacy overrides are in the
+    512x288 reference pixels of the analytics constants. Results go to a new
+    history run (or `out_dir`) with a copy of the track log, so the original
+    run and its cache entry stay as they were. Returns the output run dir.
+    """
+    from backend.process_video import camera_analytics, new_run, write_summary
+
+    columns, meta = load_tracks(run_dir)
+    g = meta["geometry"]
+    geometry = FrameGeometry(g["source_size"], g["frame_size"], g["resize_mode"])
+
+    # Unset parameters keep what the run was analysed with
+    rules = dict(meta.get("rules") or {})
+    if stop_line_y is not None:
+        rules["stop_line_y"] = stop_line_y
+    if queue_box is not None:
+        rules["queue_box"] = list(queue_box)
+    if speed_threshold is not None:
+        rules["speed_threshold"] = speed_threshold
+    if zones is not None:
+        meta["zones"] = _stored_zones(zones)
+    meta["rules"] = rules
+
+    analytics = camera_analytics(_run_zones(meta), geometry, **rules)
+
+    if out_dir is None:
+        run_id, out_dir = new_run("reanalysis")
+    else:
+        run_id = os.path.basename(os.path.normpath(out_dir))
+        os.makedirs(out_dir, exist_ok=True)
+
+    header = analytics.header()
+    if "lag_ms" in columns:
+        header += ["dropped_frames", "lag_ms"]
+
+    # Row timestamps come from the original run's metrics, when it has them
+    timestamps = [None] * len(columns["step"])
+    if has_metrics(run_dir):
+        stamps = load_columns(run_dir, ["timestamp"]).get("timestamp")
+        if stamps is not None and len(stamps) == len(timestamps):
+            timestamps = [None if np.isnan(t) else t for t in stamps.tolist()]
+
+    metrics = MetricsWriter(out_dir, header)
+    try:
+        for row, timestamp in zip(replay(columns, analytics), timestamps):
+            metrics.write(row, timestamp)
+    finally:
+        metrics.close()
+
+    # The output run can itself be re-analysed from its own track log
+    if os.path.abspath(out_dir) != os.path.abspath(run_dir):
+        shutil.copytree(os.path.join(run_dir, TRACKS_DIR),
+                        os.path.join(out_dir, TRACKS_DIR), dirs_exist_ok=True)
+    _write_schema(os.path.join(out_dir, TRACKS_DIR), meta, {
+        name: (col.dtype, col.shape[1] if col.ndim > 1 else 1)
+        for name, col in columns.items() if not name.endswith("_offsets")
+    })
+
+    extra = {
+        "reanalysis_of": os.path.basename(os.path.normpath(run_dir)),
+        "rules": rules,
+        **geometry.describe(),
+    }
+    write_summary(run_id, out_dir, analytics, extra)
+    return out_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-analyse a run's track log")
+    parser.add_argument("run_dir", help="history/<run_id> with a tracks/ log")
+    parser.add_argument("--zones", help="zone config JSON to use instead")
+    parser.add_argument("--stop-line-y", type=float)
+    parser.add_argument("--queue-box", type=float, nargs=4,
+                        metavar=("X1", "Y1", "X2", "Y2"))
+    parser.add_argument("--speed", type=float, help="SPEED_THRESHOLD override")
+    parser.add_argument("--out", help="output dir (default: new history run)")
+    args = parser.parse_args()
+
+    print(reanalyze(args.run_dir, args.zones, args.stop_line_y, args.queue_box,
+                    args.speed, args.out))
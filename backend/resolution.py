@@ -0,0 +1,157 @@
+import copy
+
+import cv2
+import numpy as np
+
+from backend.analytics import (
+    FRAME_SIZE,
+    QUEUE_X1,
+    QUEUE_X2,
+    QUEUE_Y1,
+    QUEUE_Y2,
+    SPEED_THRESHOLD,
+    STOP_LINE_Y,
+)
+
+# ======================================================
+# RESOLUTION MANAGER
+# ======================================================
+# Maps each camera's source frames to the processing resolution the detector,
+# tracker and rules work in, and keeps the transform in both directions.
+#
+#   "stretch"   - plain resize to the target size (legacy; distorts non-16:9)
+#   "letterbox" - uniform scale, padded to the target size with YOLO grey
+#   "fit"       - uniform scale to fit inside the target size, no padding
+#
+# Zone configs can be written in processing pixels ("units": "pixels", the
+# default), source pixels ("source") or fractions of the source frame
+# ("normalized"), and may pick their own "frame_size" and "resize_mode", so
+# a quiet camera can run at a smaller inference size with the same zones.
+# The legacy rule constants were tuned on stretched 512x288 frames and are
+# treated as normalized coordinates of that frame.
+
+RESIZE_MODES = ("stretch", "letterbox", "fit")
+PAD_VALUE = 114
+
+
+class FrameGeometry:
+    """Source <-> processing pixel transform for one camera."""
+
+    def __init__(self, source_size, size=FRAME_SIZE, mode="stretch"):
+        if mode not in RESIZE_MODES:
+            raise ValueError(f"Unknown resize mode: {mode}")
+
+        sw, sh = self.source_size = tuple(int(v) for v in source_size)
+        tw, th = tuple(int(v) for v in size)
+        if sw <= 0 or sh <= 0:
+            raise ValueError(f"Invalid source resolution: {source_size}")
+
+        self.mode = mode
+        if mode == "stretch":
+            self.sx, self.sy = tw / float(sw), th / float(sh)
+            self.scaled = (tw, th)
+        else:
+            self.sx = self.sy = min(tw / float(sw), th / float(sh))
+            self.scaled = (max(1, round(sw * self.sx)), max(1, round(sh * self.sy)))
+
+        self.size = (tw, th) if mode != "fit" else self.scaled
+        self.ox = (self.size[0] - self.scaled[0]) // 2
+        self.oy = (self.size[1] - self.scaled[1]) // 2
+
+    def describe(self):
+        return {
+            "source_size": list(self.source_size),
+            "frame_size": list(self.size),
+            "resize_mode": self.mode,
+        }
+
+    # ================= IMAGES =================
+    def apply(self, image):
+        """Source BGR frame -> processing frame."""
+        out = cv2.resize(image, self.scaled)
+        if self.scaled != self.size:
+            right = self.size[0] - self.scaled[0] - self.ox
+            bottom = self.size[1] - self.scaled[1] - self.oy
+            out = cv2.copyMakeBorder(out, self.oy, bottom, self.ox, right,
+                                     cv2.BORDER_CONSTANT,
+                                     value=(PAD_VALUE, PAD_VALUE, PAD_VALUE))
+        return out
+
+    # ================= COORDINATES =================
+    # Arrays of x, y pairs in the last axis: (n, 2) points or (n, 4) boxes.
+    def from_source(self, xy):
+        out = np.asarray(xy, dtype=np.float64).copy()
+        out[..., 0::2] = out[..., 0::2] * self.sx + self.ox
+        out[..., 1::2] = out[..., 1::2] * self.sy + self.oy
+        return out
+
+    def to_source(self, xy):
+        out = np.asarray(xy, dtype=np.float64).copy()
+        out[..., 0::2] = (out[..., 0::2] - self.ox) / self.sx
+        out[..., 1::2] = (out[..., 1::2] - self.oy) / self.sy
+        return out
+
+    def from_normalized(self, xy):
+        out = np.asarray(xy, dtype=np.float64).copy()
+        out[..., 0::2] *= self.source_size[0]
+        out[..., 1::2] *= self.source_size[1]
+        return self.from_source(out)
+
+    # ================= ZONES + RULES =================
+    def project_zones(self, config):
+        """Copy of a zone config with every point in processing pixels."""
+        units = config.get("units", "pixels")
+        if units == "pixels":
+            return config
+        if units == "source":
+            project = self.from_source
+        elif units == "normalized":
+            project = self.from_normalized
+        else:
+            raise ValueError(f"Unknown zone units: {units}")
+
+        def points(pts):
+            return np.rint(project(pts)).astype(int).tolist()
+
+        out = copy.deepcopy(config)
+        out["units"] = "pixels"
+        for q in out.get("queues", []):
+            q["polygon"] = points(q["polygon"])
+        for line in out.get("stop_lines", []):
+            line["points"] = points(line["points"])
+        return out
+
+    def legacy_rules(self, queue_box=None, stop_line_y=None, speed_threshold=None):
+        """Legacy queue box, stop line and speed threshold at this geometry.
+
+        Overrides are given like the constants, in 512x288 reference pixels.
+        """
+        fw, fh = FRAME_SIZE
+        qx1, qy1, qx2, qy2 = queue_box or (QUEUE_X1, QUEUE_Y1, QUEUE_X2, QUEUE_Y2)
+        line = STOP_LINE_Y if stop_line_y is None else stop_line_y
+        speed = SPEED_THRESHOLD if speed_threshold is None else speed_threshold
+
+        corners = self.from_normalized([
+            [qx1 / fw, qy1 / fh],
+            [qx2 / fw, qy2 / fh],
+            [0.0, line / fh],
+        ])
+        (x1, y1), (x2, y2), (_, line_y) = np.rint(corners).astype(int).tolist()
+
+        # px per step scales with the source -> processing scale
+        scale = (self.sx * self.source_size[0] / fw
+                 + self.sy * self.source_size[1] / fh) / 2
+        return {
+            "queue_box": (x1, y1, x2, y2),
+            "stop_line_y": line_y,
+            "speed_threshold": speed * scale,
+        }
+
+
+def camera_geometry(source_size, config=None, size=None, mode=None,
+                    default_size=FRAME_SIZE):
+    """Geometry for one camera; explicit arguments win over the zone config."""
+    config = config or {}
+    size = size or config.get("frame_size") or default_size
+    mode = mode or config.get("resize_mode") or "stretch"
+    return FrameGeometry(source_size, size, mode)
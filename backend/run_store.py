@@ -0,0 +1,167 @@
+import csv
+import json
+import math
+import os
+
+import numpy as np
+
+# ======================================================
+# COLUMNAR RUN STORAGE
+# ======================================================
+# Per-frame metrics are kept in history/<run_id>/metrics/ as one raw binary
+# file per column plus schema.json (column dtypes and the committed row
+# count). Rows are buffered and appended in batches; the row count is only
+# bumped after the batch is on disk, so a reader never sees a torn row and a
+# run can be read while it is still being written. Every column opens as a
+# read-only np.memmap, so loading touches only the columns (and, for the Live
+# page, the single row) that are actually used.
+#
+# Columns are the analytics CSV columns (int64, lag_ms float64) plus the
+# source `timestamp` of each row in seconds. traffic_log.csv is still
+# written when the run closes, with exactly the legacy columns and format.
+
+METRICS_DIR = "metrics"
+SCHEMA_FILE = "schema.json"
+CSV_FILE = "traffic_log.csv"
+FLUSH_ROWS = 256
+
+FLOAT_COLUMNS = ("lag_ms", "timestamp")
+
+
+def _dtype(name):
+    return np.float64 if name in FLOAT_COLUMNS else np.int64
+
+
+class MetricsWriter:
+    """Buffered columnar writer for one run's per-frame rows.
+
+    `write(row, timestamp)` takes a row in `header` order. Rows reach disk
+    every `flush_rows` rows (1 in real time, so the Live page is current).
+    """
+
+    def __init__(self, run_dir, header, flush_rows=FLUSH_ROWS):
+        self.run_dir = run_dir
+        self.header = list(header)
+        self.columns = self.header + ["timestamp"]
+        self.flush_rows = max(1, int(flush_rows))
+        self.rows = 0
+
+        self.dir = os.path.join(run_dir, METRICS_DIR)
+        os.makedirs(self.dir, exist_ok=True)
+        self._buffer = {name: [] for name in self.columns}
+        self._files = {
+            name: open(os.path.join(self.dir, f"{name}.bin"), "wb")
+            for name in self.columns
+        }
+        self._write_schema()
+
+    def _write_schema(self):
+        schema = {
+            "columns": {name: np.dtype(_dtype(name)).str for name in self.columns},
+            "csv_columns": self.header,
+            "rows": self.rows,
+        }
+        tmp = os.path.join(self.dir, SCHEMA_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(schema, f)
+        os.replace(tmp, os.path.join(self.dir, SCHEMA_FILE))
+
+    def write(self, row, timestamp=None):
+        for name, value in zip(self.header, row):
+            self._buffer[name].append(np.nan if value is None else value)
+        self._buffer["timestamp"].append(np.nan if timestamp is None else timestamp)
+
+        if len(self._buffer["timestamp"]) >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        n = len(self._buffer["timestamp"])
+        if not n:
+            return
+        for name in self.columns:
+            f = self._files[name]
+            f.write(np.asarray(self._buffer[name], dtype=_dtype(name)).tobytes())
+            f.flush()
+            self._buffer[name] = []
+        self.rows += n
+        self._write_schema()
+
+    def close(self, csv_export=True):
+        """Flush, close the column files and write the legacy CSV."""
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        if csv_export:
+            export_csv(self.run_dir)
+
+
+# ======================================================
+# LOADING
+# ======================================================
+def has_metrics(run_dir):
+    return os.path.exists(os.path.join(run_dir, METRICS_DIR, SCHEMA_FILE))
+
+
+def _schema(run_dir):
+    with open(os.path.join(run_dir, METRICS_DIR, SCHEMA_FILE)) as f:
+        return json.load(f)
+
+
+def load_columns(run_dir, columns=None):
+    """{name: read-only array} for the committed rows (memory-mapped)."""
+    schema = _schema(run_dir)
+    rows = schema["rows"]
+    out = {}
+    for name in columns or schema["columns"]:
+        if name not in schema["columns"]:
+            continue
+        dtype = np.dtype(schema["columns"][name])
+        path = os.path.join(run_dir, METRICS_DIR, f"{name}.bin")
+        if rows == 0:
+            out[name] = np.empty(0, dtype=dtype)
+        else:
+            out[name] = np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+    return out
+
+
+def load_metrics(run_dir, columns=None):
+    """DataFrame of a run's metrics with only `columns` (CSV for old runs)."""
+    import pandas as pd
+
+    if has_metrics(run_dir):
+        return pd.DataFrame(load_columns(run_dir, columns))
+
+    csv_path = os.path.join(run_dir, CSV_FILE)
+    if columns is None:
+        return pd.read_csv(csv_path)
+    return pd.read_csv(csv_path, usecols=lambda c: c in set(columns))
+
+
+def last_metrics(run_dir, columns=None):
+    """The last committed row as a {name: value} dict, or None."""
+    if not has_metrics(run_dir):
+        df = load_metrics(run_dir, columns)
+        return df.iloc[-1].to_dict() if len(df) else None
+
+    data = load_columns(run_dir, columns)
+    if not data or not len(next(iter(data.values()))):
+        return None
+    return {name: col[-1].item() for name, col in data.items()}
+
+
+def export_csv(run_dir, path=None):
+    """Write the legacy traffic_log.csv from the columnar store."""
+    schema = _schema(run_dir)
+    header = schema["csv_columns"]
+    data = load_columns(run_dir, header)
+
+    def cells(name):
+        values = data[name].tolist()
+        if data[name].dtype.kind == "f":
+            return ["" if math.isnan(v) else v for v in values]
+        return values
+
+    with open(path or os.path.join(run_dir, CSV_FILE), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(zip(*(cells(name) for name in header)))
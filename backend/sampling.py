@@ -0,0 +1,83 @@
+import cv2
+import numpy as np
+
+# ======================================================
+# MOTION-GATED ADAPTIVE SAMPLING
+# ======================================================
+# Sits between the FrameSource and the detector. Every candidate frame is
+# shrunk to a tiny grayscale thumbnail and diffed against the previous
+# candidate inside the queue zones and the stop-line bands. Busy scenes are
+# sampled at `min_interval`, quiet ones back off towards `max_interval`, and
+# a sudden burst of motion is picked up immediately.
+
+THUMB_SIZE = (64, 36)
+STOP_BAND = 20                  # px either side of each stop line
+
+
+class MotionSampler:
+    """Keeps 1 of every `interval` candidate frames, adapting to motion."""
+
+    def __init__(self, frame_size, regions, min_interval=1, max_interval=8,
+                 low=1.5, high=6.0):
+        self.min_interval = max(1, int(min_interval))
+        self.max_interval = max(self.min_interval, int(max_interval))
+        self.low = low
+        self.high = high
+
+        self.interval = self.min_interval
+        self.mask = self._build_mask(frame_size, regions)
+
+        self.kept = 0
+        self.skipped = 0
+        self._prev = None
+        self._since_kept = 0
+
+    @staticmethod
+    def _build_mask(frame_size, regions):
+        w, h = frame_size
+        tw, th = THUMB_SIZE
+        sx, sy = tw / float(w), th / float(h)
+
+        mask = np.zeros((th, tw), dtype=bool)
+        for x1, y1, x2, y2 in regions:
+            c1, r1 = max(0, int(x1 * sx)), max(0, int(y1 * sy))
+            c2, r2 = min(tw, int(np.ceil(x2 * sx))), min(th, int(np.ceil(y2 * sy)))
+            mask[r1:r2, c1:c2] = True
+
+        if not mask.any():
+            mask[:] = True
+        return mask
+
+    def score(self, image):
+        """Mean absolute grey-level change inside the watched regions."""
+        thumb = cv2.resize(image, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+
+        prev, self._prev = self._prev, thumb
+        if prev is None:
+            return float("inf")
+
+        return float(cv2.absdiff(thumb, prev)[self.mask].mean())
+
+    def keep(self, image):
+        motion = self.score(image)
+        self._since_kept += 1
+
+        if motion >= self.high:
+            self.interval = self.min_interval
+        elif motion <= self.low:
+            self.interval = min(self.interval * 2, self.max_interval)
+
+        if motion >= self.high or self._since_kept >= self.interval:
+            self._since_kept = 0
+            self.kept += 1
+            return True
+
+        self.skipped += 1
+        return False
+
+    def __call__(self, frames, image=None):
+        """Filter a frame stream; `image(frame)` extracts the BGR array."""
+        for frame in frames:
+            if self.keep(frame if image is None else image(frame)):
+                yield frame
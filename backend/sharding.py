@@ -0,0 +1,207 @@
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.models import (
+    BatchSizer,
+    detect_batches,
+    get_detector,
+    vehicle_detections,
+)
+from backend.process_video import (
+    FRAME_SKIP,
+    camera_analytics,
+    new_run,
+    process_video,
+    setup_camera,
+    write_summary,
+)
+from backend.replay import TrackLog
+from backend.run_store import MetricsWriter
+from backend.trackers import make_tracker
+from backend.tuning import load_tuning, set_threads, tuned_threads
+from src.video_loader import FrameSource
+
+# ======================================================
+# SHARDED PROCESSING
+# ======================================================
+# A long video is split into ranges of sampled frames. Every shard runs in
+# its own process with its own detector and tracker, and starts `overlap`
+# sampled frames early so its tracker has confirmed the vehicles already on
+# screen by the time the shard proper begins. Local track IDs are stitched to
+# the previous shard by box IoU over that overlap window, then the usual
+# traffic rules run once over the stitched sequence, so counts line up with a
+# serial run.
+
+MIN_SHARD_SAMPLES = 300
+STITCH_IOU = 0.5
+
+
+def _init_worker(threads, cv2_threads=1):
+    set_threads(threads, cv2_threads)
+
+
+def _run_shard(video_path, first_sample, n_samples, weights, batch_size,
+               tracker_kind, geometry):
+    """Confirmed track boxes for `n_samples` sampled frames from `first_sample`."""
+    model = get_detector(weights, (geometry.size[1], geometry.size[0]))
+    tracker = make_tracker(tracker_kind, model.names, max_age=30)
+    sizer = BatchSizer(batch_size, None)
+
+    source = FrameSource(
+        video_path,
+        frame_skip=FRAME_SKIP,
+        start=first_sample * FRAME_SKIP,
+        transform=geometry.apply,
+    )
+    frames = (f.image for f in itertools.islice(source, n_samples))
+
+    per_frame = []
+    try:
+        for frame, result in detect_batches(model, frames, sizer):
+            detections = vehicle_detections(model, result)
+            per_frame.append(tracker.update(detections, frame))
+    finally:
+        source.release()
+
+    return per_frame
+
+
+def _iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+def _match_overlap(prev_frames, next_frames, min_iou=STITCH_IOU):
+    """Greedy {next_local_id: prev_global_id} by mean IoU over shared frames."""
+    scores = {}
+
+    for prev_boxes, next_boxes in zip(prev_frames, next_frames):
+        for gid, *pbox in prev_boxes:
+            for tid, *nbox in next_boxes:
+                iou = _iou(pbox, nbox)
+                total, count = scores.get((tid, gid), (0.0, 0))
+                scores[(tid, gid)] = (total + iou, count + 1)
+
+    ranked = sorted(
+        ((total / count, tid, gid) for (tid, gid), (total, count) in scores.items()),
+        key=lambda s: s[0],
+        reverse=True,
+    )
+
+    mapping = {}
+    used = set()
+    for score, tid, gid in ranked:
+        if score < min_iou:
+            break
+        if tid in mapping or gid in used:
+            continue
+        mapping[tid] = gid
+        used.add(gid)
+
+    return mapping
+
+
+def _stitch(shards, overlaps):
+    """Merge per-shard box lists into one sequence with global track IDs."""
+    stitched = []
+    next_gid = itertools.count(1)
+
+    for index, (per_frame, overlap) in enumerate(zip(shards, overlaps)):
+        if index == 0:
+            mapping = {}
+        else:
+            mapping = _match_overlap(stitched[-overlap:], per_frame[:overlap])
+
+        for boxes in per_frame[overlap:]:
+            frame_boxes = []
+            for tid, l, t_, r, b in boxes:
+                if tid not in mapping:
+                    mapping[tid] = next(next_gid)
+                frame_boxes.append((mapping[tid], l, t_, r, b))
+            stitched.append(frame_boxes)
+
+    return stitched
+
+
+def plan_shards(n_samples, workers, overlap, min_shard=MIN_SHARD_SAMPLES):
+    """[(first_sample, n_samples, overlap)] covering [0, n_samples)."""
+    if n_samples <= 0:
+        raise ValueError(f"Nothing to shard: {n_samples} sampled frames")
+    n_shards = max(1, min(workers, n_samples // max(min_shard, 1)))
+    size = -(-n_samples // n_shards)
+
+    plan = []
+    for start in range(0, n_samples, size):
+        lead = min(overlap, start)
+        end = min(start + size, n_samples)
+        plan.append((start - lead, end - start + lead, lead))
+
+    return plan
+
+
+def process_video_sharded(video_path, workers=None, overlap=30,
+                          weights="yolov8n.pt", batch_size=4,
+                          tracker_backend="deepsort", zones=None,
+                          frame_size=None, resize_mode=None):
+    """Sharded `process_video`: same history/<run_id> outputs, no live preview."""
+    # Worker and thread counts from the machine's tuning, if it has one
+    tuning = load_tuning() or {}
+    workers = workers or tuning.get("workers") or max(1, (os.cpu_count() or 1) // 2)
+
+    with FrameSource(video_path) as source:
+        total_frames = source.frame_count
+        fps = source.fps
+        geometry = setup_camera(source, zones, frame_size, resize_mode)
+
+    # Streams and some containers report no frame count: nothing to split,
+    # so the video is processed in one pass instead
+    n_samples = total_frames // FRAME_SKIP
+    if n_samples <= 0:
+        return process_video(video_path, weights=weights, batch_size=batch_size,
+                             tracker_backend=tracker_backend, zones=zones,
+                             frame_size=frame_size, resize_mode=resize_mode)
+    plan = plan_shards(n_samples, workers, overlap)
+
+    # ================= RUN SHARDS =================
+    threads, cv2_threads = tuned_threads(tuning, len(plan))
+    ctx = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(max_workers=len(plan), mp_context=ctx,
+                             initializer=_init_worker,
+                             initargs=(threads, cv2_threads)) as pool:
+        futures = [
+            pool.submit(_run_shard, video_path, first, count, weights,
+                        batch_size, tracker_backend, geometry)
+            for first, count, _ in plan
+        ]
+        shards = [f.result() for f in futures]
+
+    stitched = _stitch(shards, [lead for _, _, lead in plan])
+
+    # ================= ANALYTICS + OUTPUT =================
+    run_id, run_dir = new_run()
+    analytics = camera_analytics(zones, geometry)
+    track_log = TrackLog(geometry, zones, run_dir=run_dir)
+
+    metrics = MetricsWriter(run_dir, analytics.header())
+    try:
+        for i, boxes in enumerate(stitched):
+            index = (i + 1) * FRAME_SKIP - 1        # FrameSource keeps these
+            metrics.write(analytics.update(boxes), index / fps if fps else None)
+            track_log.add(index, 1, boxes)
+    finally:
+        metrics.close()
+        track_log.save()
+
+    write_summary(run_id, run_dir, analytics, geometry.describe())
+
+    return run_dir
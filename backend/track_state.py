@@ -0,0 +1,130 @@
+import sys
+
+import numpy as np
+
+# ======================================================
+# BOUNDED TRACK-STATE STORE
+# ======================================================
+# Struct-of-arrays storage for per-track rule state. Each live track ID owns a
+# dense slot; when the tracker drops the ID (explicit `release`) or it has not
+# been updated for `ttl` frames, the slot is cleared and reused, so memory is
+# bounded by the number of simultaneous tracks rather than by every vehicle
+# ever seen on a 24-hour stream. Cumulative counts are kept by the caller.
+
+EVICT_EVERY = 32                # frames between TTL sweeps
+
+
+class TrackStore:
+
+    def __init__(self, columns, capacity=256, ttl=None):
+        """`columns` maps column name -> NumPy dtype."""
+        self.ttl = ttl
+        self.cols = {name: np.zeros(capacity, dtype=dtype)
+                     for name, dtype in columns.items()}
+        self.last_frame = np.zeros(capacity, dtype=np.int64)
+        self.in_use = np.zeros(capacity, dtype=bool)
+
+        self._slot_of = {}
+        self._id_of = [None] * capacity
+        self._free = []
+        self._next = 0
+
+        self.evicted = 0
+
+    def __getitem__(self, name):
+        return self.cols[name]
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    @property
+    def capacity(self):
+        return len(self.in_use)
+
+    # ================= SLOTS =================
+    def _grow(self):
+        capacity = self.capacity * 2
+
+        for name, old in list(self.cols.items()):
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            self.cols[name] = new
+
+        for name in ("last_frame", "in_use"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+        self._id_of.extend([None] * (capacity - len(self._id_of)))
+
+    def _assign(self, tid):
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._next == self.capacity:
+                self._grow()
+            slot = self._next
+            self._next += 1
+
+        self._slot_of[tid] = slot
+        self._id_of[slot] = tid
+        self.in_use[slot] = True
+        return slot
+
+    def slots_for(self, ids, frame):
+        """Slots for `ids` (allocating new ones), stamped as seen at `frame`."""
+        slot_of = self._slot_of
+        slots = np.fromiter(
+            (slot_of[tid] if tid in slot_of else self._assign(tid) for tid in ids),
+            dtype=np.int64,
+            count=len(ids),
+        )
+        self.last_frame[slots] = frame
+        return slots
+
+    # ================= EVICTION =================
+    def _clear(self, slot):
+        tid = self._id_of[slot]
+        del self._slot_of[tid]
+        self._id_of[slot] = None
+        self.in_use[slot] = False
+        for col in self.cols.values():
+            col[slot] = 0
+        self._free.append(slot)
+        self.evicted += 1
+
+    def release(self, ids):
+        """Forget tracks the tracker has deleted."""
+        for tid in ids:
+            slot = self._slot_of.get(tid)
+            if slot is not None:
+                self._clear(slot)
+
+    def retain(self, alive_ids):
+        """Forget every stored track that is not in `alive_ids`."""
+        alive = set(alive_ids)
+        self.release([tid for tid in self._slot_of if tid not in alive])
+
+    def maintain(self, frame):
+        """Periodic TTL sweep; call once per frame."""
+        if self.ttl is not None and frame % EVICT_EVERY == 0:
+            self.evict_stale(frame)
+
+    def evict_stale(self, frame):
+        stale = np.flatnonzero(self.in_use & (self.last_frame < frame - self.ttl))
+        for slot in stale.tolist():
+            self._clear(slot)
+
+    def footprint(self):
+        """Approximate bytes held by the store, for long-run RSS checks."""
+        arrays = sum(col.nbytes for col in self.cols.values())
+        arrays += self.last_frame.nbytes + self.in_use.nbytes
+        index = (sys.getsizeof(self._slot_of) + sys.getsizeof(self._id_of)
+                 + sys.getsizeof(self._free))
+        return {
+            "live_tracks": len(self),
+            "capacity": self.capacity,
+            "evicted": self.evicted,
+            "bytes": int(arrays + index),
+        }
@@ -0,0 +1,218 @@
+import itertools
+
+import numpy as np
+
+from backend.analytics import confirmed_boxes
+from backend.embedding import EmbeddingPolicy
+from backend.geometry import iou_matrix
+from backend.models import deepsort_detections, new_tracker
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:             # greedy matching without scipy
+    linear_sum_assignment = None
+
+# ======================================================
+# TRACKER BACKENDS
+# ======================================================
+# Every backend takes one frame's `Detections` arrays and returns confirmed
+# tracks as (track_id, l, t, r, b) integer tuples - the format the
+# analytics engine consumes - so rules do not care which one is running.
+#
+#   update(dets, frame) -> boxes     one detector frame
+#   predict()           -> boxes     advance the motion model one frame
+#   alive_ids()         -> ids       every track the backend still holds
+#   stats()             -> dict      backend counters for summary.json
+#
+# "deepsort" : DeepSORT with the shared appearance embedder (re-ID)
+# "iou"      : motion-only ByteTrack-style IoU association, no embedder
+
+
+class DeepSortBackend:
+    name = "deepsort"
+
+    def __init__(self, names, max_age=30, n_init=3, max_iou_distance=0.7,
+                 embed_every=1):
+        self.names = names
+        self.tracker = new_tracker(
+            max_age=max_age, n_init=n_init, max_iou_distance=max_iou_distance
+        )
+        self.embeddings = EmbeddingPolicy(refresh_every=embed_every)
+
+    def update(self, dets, frame):
+        raw_dets = deepsort_detections(dets, self.names)
+        tracks = self.embeddings.update(self.tracker, raw_dets, frame)
+        return confirmed_boxes(tracks)
+
+    def predict(self):
+        self.tracker.tracker.predict()
+        return confirmed_boxes(self.tracker.tracker.tracks)
+
+    def alive_ids(self):
+        return [t.track_id for t in self.tracker.tracker.tracks]
+
+    def stats(self):
+        return self.embeddings.stats()
+
+
+# ======================================================
+# IOU / BYTETRACK-STYLE TRACKER
+# ======================================================
+def match(iou, min_iou):
+    """(rows, cols) pairs maximising IoU, each at least `min_iou`."""
+    if iou.size == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(-iou)
+        keep = iou[rows, cols] >= min_iou
+        return rows[keep], cols[keep]
+
+    order = np.argsort(-iou, axis=None)
+    rows, cols = np.unravel_index(order, iou.shape)
+    keep = iou[rows, cols] >= min_iou
+    rows, cols = rows[keep], cols[keep]
+
+    used_r, used_c = set(), set()
+    out_r, out_c = [], []
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        if r in used_r or c in used_c:
+            continue
+        used_r.add(r)
+        used_c.add(c)
+        out_r.append(r)
+        out_c.append(c)
+    return np.array(out_r, dtype=int), np.array(out_c, dtype=int)
+
+
+class IouTracker:
+    """Constant-velocity IoU tracker with ByteTrack's two-stage association.
+
+    High-confidence detections are matched first; low-confidence ones can
+    then only extend existing tracks, never start new ones.
+    """
+
+    name = "iou"
+
+    def __init__(self, max_age=30, n_init=3, min_iou=0.3, high_conf=0.5):
+        self.max_age = max_age
+        self.n_init = n_init
+        self.min_iou = min_iou
+        self.high_conf = high_conf
+
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.boxes = np.zeros((0, 4), dtype=np.float64)
+        self.velocity = np.zeros((0, 4), dtype=np.float64)
+        self.last_box = np.zeros((0, 4), dtype=np.float64)
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.since = np.zeros(0, dtype=np.int64)
+
+        self._next_id = itertools.count(1)
+
+    # ================= MOTION =================
+    def _step(self):
+        self.boxes += self.velocity
+        self.since += 1
+
+    def _output(self):
+        confirmed = self.hits >= self.n_init
+        ltrb = self.boxes[confirmed].astype(int)
+        return [
+            (str(tid), l, t, r, b)
+            for tid, (l, t, r, b) in zip(self.ids[confirmed].tolist(), ltrb.tolist())
+        ]
+
+    def predict(self):
+        self._step()
+        return self._output()
+
+    def alive_ids(self):
+        return [str(tid) for tid in self.ids.tolist()]
+
+    def stats(self):
+        return {}
+
+    # ================= ASSOCIATION =================
+    def _assign(self, track_idx, det_boxes):
+        steps = np.maximum(self.since[track_idx], 1)[:, None]
+        moved = (det_boxes - self.last_box[track_idx]) / steps
+        self.velocity[track_idx] = 0.6 * self.velocity[track_idx] + 0.4 * moved
+
+        self.boxes[track_idx] = det_boxes
+        self.last_box[track_idx] = det_boxes
+        self.hits[track_idx] += 1
+        self.since[track_idx] = 0
+
+    def _associate(self, tracks, det_idx, det_boxes, matched):
+        """Match `tracks` to detections `det_idx`; returns the used detections."""
+        if not len(tracks) or not len(det_idx):
+            return det_idx[:0]
+
+        iou = iou_matrix(self.boxes[tracks], det_boxes[det_idx])
+        rows, cols = match(iou, self.min_iou)
+
+        self._assign(tracks[rows], det_boxes[det_idx[cols]])
+        matched[tracks[rows]] = True
+        return det_idx[cols]
+
+    def update(self, dets, frame=None):
+        self._step()
+
+        det_boxes = dets.xyxy.astype(np.float64)
+        high = dets.conf >= self.high_conf
+        high_dets = np.flatnonzero(high)
+        matched = np.zeros(len(self.ids), dtype=bool)
+
+        # -------- STAGE 1: HIGH-CONFIDENCE --------
+        used = self._associate(np.flatnonzero(~matched), high_dets, det_boxes, matched)
+
+        # -------- STAGE 2: LOW-CONFIDENCE --------
+        self._associate(np.flatnonzero(~matched), np.flatnonzero(~high),
+                        det_boxes, matched)
+
+        new_dets = np.setdiff1d(high_dets, used)
+
+        # -------- DROP LOST TRACKS --------
+        tentative = self.hits < self.n_init
+        lost = ~matched & (tentative | (self.since > self.max_age))
+        self._keep(~lost)
+
+        # -------- START NEW TRACKS --------
+        if len(new_dets):
+            n = len(new_dets)
+            boxes = det_boxes[new_dets]
+            new_ids = np.fromiter((next(self._next_id) for _ in range(n)),
+                                  dtype=np.int64, count=n)
+
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.boxes = np.concatenate([self.boxes, boxes])
+            self.velocity = np.concatenate([self.velocity, np.zeros((n, 4))])
+            self.last_box = np.concatenate([self.last_box, boxes])
+            self.hits = np.concatenate([self.hits, np.ones(n, dtype=np.int64)])
+            self.since = np.concatenate([self.since, np.zeros(n, dtype=np.int64)])
+
+        return self._output()
+
+    def _keep(self, mask):
+        self.ids = self.ids[mask]
+        self.boxes = self.boxes[mask]
+        self.velocity = self.velocity[mask]
+        self.last_box = self.last_box[mask]
+        self.hits = self.hits[mask]
+        self.since = self.since[mask]
+
+
+# ======================================================
+# FACTORY
+# ======================================================
+TRACKERS = ("deepsort", "iou")
+
+
+def make_tracker(kind, names, max_age=30, n_init=3, embed_every=1):
+    """Fresh per-run tracker backend by name."""
+    if kind == "deepsort":
+        return DeepSortBackend(names, max_age=max_age, n_init=n_init,
+                               embed_every=embed_every)
+    if kind == "iou":
+        return IouTracker(max_age=max_age, n_init=n_init)
+    raise ValueError(f"Unknown tracker backend: {kind}")
@@ -0,0 +1,269 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import cv2
+
+# ======================================================
+# THREAD / CORE AUTO-TUNER
+# ======================================================
+# Torch intra-op threads, OpenCV's pool and sharded workers all compete for
+# the same cores. `tune` benchmarks decode + detection on a sample clip for
+# combinations of
+#
+#   workers        parallel processes (as in backend.sharding)
+#   torch_threads  torch.set_num_threads per worker
+#   cv2_threads    cv2.setNumThreads per worker
+#
+# keeping workers * torch_threads within the core count, and stores the
+# highest aggregate-throughput combination for this machine. The threads
+# that win with several workers starve a process that has the machine to
+# itself, so the single-process configuration (decode and detection in
+# process_video's threaded pipeline, including its queue size) is
+# benchmarked and stored separately under "single".
+#
+# `apply_tuning(workers)` applies the configuration for one of `workers`
+# concurrent processes: "single" for process_video, the multi-camera engine
+# and the inference daemon, the tuned per-worker threads for sharded and
+# batch workers, and cores // workers for a worker count that was not
+# tuned. Without a stored result nothing is changed.
+#
+#   python -m backend.tuning data/sample_video.mp4
+
+TUNING_PATH = os.environ.get(
+    "TRAFFIC_TUNING_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "traffic-intelligence",
+                 "tuning.json"),
+)
+TUNE_FRAMES = 40
+TUNE_BATCH = 4
+TUNE_QUEUE_SIZES = (2, 4, 8, 16)
+
+_APPLIED = None
+
+
+def machine_key():
+    return f"{platform.node()}|{platform.machine()}|{os.cpu_count()}"
+
+
+def load_tuning(path=TUNING_PATH):
+    """Stored configuration for this machine, or None."""
+    try:
+        with open(path) as f:
+            return json.load(f).get(machine_key())
+    except (OSError, ValueError):
+        return None
+
+
+def save_tuning(config, path=TUNING_PATH):
+    try:
+        with open(path) as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        stored = {}
+
+    stored[machine_key()] = config
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(stored, f, indent=4)
+
+
+def set_threads(torch_threads=None, cv2_threads=None):
+    if cv2_threads is not None:
+        cv2.setNumThreads(int(cv2_threads))
+    if torch_threads is not None:
+        try:
+            import torch
+            torch.set_num_threads(int(torch_threads))
+        except ImportError:
+            pass
+
+
+def tuned_threads(config, workers=1):
+    """(torch_threads, cv2_threads) for one of `workers` concurrent processes."""
+    single = config.get("single")
+    if workers <= 1 and single:
+        return single["torch_threads"], single["cv2_threads"]
+    if workers == config.get("workers"):
+        return config["torch_threads"], config["cv2_threads"]
+
+    threads = max(1, (os.cpu_count() or 1) // max(1, workers))
+    return threads, min(config.get("cv2_threads", 1), threads)
+
+
+def apply_tuning(workers=1, path=TUNING_PATH):
+    """Apply this machine's stored thread counts once per process.
+
+    `workers` is how many processes share the machine with this one. Returns
+    the applied torch_threads / cv2_threads (plus the tuned pipeline
+    queue_size, if any), or None without a stored result.
+    """
+    global _APPLIED
+    if _APPLIED is None:
+        config = load_tuning(path) or {}
+        _APPLIED = {}
+        if config:
+            torch_threads, cv2_threads = tuned_threads(config, workers)
+            set_threads(torch_threads, cv2_threads)
+            _APPLIED = {"torch_threads": torch_threads, "cv2_threads": cv2_threads}
+            queue_size = (config.get("single") or {}).get("queue_size")
+            if queue_size:
+                _APPLIED["queue_size"] = queue_size
+    return _APPLIED or None
+
+
+# ======================================================
+# CALIBRATION
+# ======================================================
+def _bench(sample, weights, n_frames, torch_threads, cv2_threads, queue_size=None):
+    """Sampled frames per second for decode + resize + detection.
+
+    With `queue_size`, decoding and detection run on separate threads of
+    process_video's pipeline; otherwise one after the other.
+    """
+    set_threads(torch_threads, cv2_threads)
+
+    from backend.models import load_detector, run_batch
+    from backend.pipeline import run_pipeline
+    from backend.process_video import FRAME_SKIP, RESIZE_HEIGHT, RESIZE_WIDTH
+    from src.video_loader import FrameSource
+
+    model = load_detector(weights, (RESIZE_HEIGHT, RESIZE_WIDTH))
+    done = 0
+
+    def detect(frames):
+        while True:
+            batch = [f.image for f in itertools.islice(frames, TUNE_BATCH)]
+            if not batch:
+                return
+            run_batch(model, batch)
+            yield len(batch)
+
+    def count(sizes):
+        nonlocal done
+        for n in sizes:
+            done += n
+
+    with FrameSource(sample, frame_skip=FRAME_SKIP,
+                     size=(RESIZE_WIDTH, RESIZE_HEIGHT)) as source:
+        frames = itertools.islice(source, n_frames)
+        start = time.perf_counter()
+        run_pipeline(frames, [detect], count, queue_size=queue_size or 1,
+                     threaded=queue_size is not None)
+
+    return done / max(time.perf_counter() - start, 1e-9)
+
+
+def candidates(cores=None):
+    """(workers, torch_threads, cv2_threads) combinations within the cores."""
+    cores = cores or os.cpu_count() or 1
+    powers = sorted({2 ** i for i in range(cores.bit_length()) if 2 ** i <= cores}
+                    | {cores})
+
+    out = []
+    for workers in powers:
+        for threads in powers:
+            if workers * threads > cores:
+                continue
+            for cv2_threads in sorted({1, threads}):
+                out.append((workers, threads, cv2_threads))
+    return out
+
+
+def tune_single(sample, weights="yolov8n.pt", n_frames=TUNE_FRAMES,
+                cores=None, queue_sizes=TUNE_QUEUE_SIZES):
+    """Best config for one process using the whole machine, pipelined."""
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+
+    def run(threads, cv2_threads, queue_size):
+        # A fresh process per run, so every combination starts from the same
+        # thread pools
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            fps = pool.submit(_bench, sample, weights, n_frames, threads,
+                              cv2_threads, queue_size).result()
+        results.append({
+            "torch_threads": threads,
+            "cv2_threads": cv2_threads,
+            "queue_size": queue_size,
+            "fps": round(fps, 2),
+        })
+        print("single", results[-1])
+        return results[-1]
+
+    default_queue = queue_sizes[len(queue_sizes) // 2]
+    best = max(
+        (run(threads, cv2_threads, default_queue)
+         for workers, threads, cv2_threads in candidates(cores) if workers == 1),
+        key=lambda r: r["fps"],
+    )
+    for queue_size in queue_sizes:
+        if queue_size != default_queue:
+            r = run(best["torch_threads"], best["cv2_threads"], queue_size)
+            if r["fps"] > best["fps"]:
+                best = r
+
+    return dict(best, results=results)
+
+
+def tune(sample, weights="yolov8n.pt", n_frames=TUNE_FRAMES, combos=None,
+         path=TUNING_PATH):
+    """Benchmark every combination on `sample` and store the fastest."""
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+
+    for workers, threads, cv2_threads in combos or candidates():
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            futures = [
+                pool.submit(_bench, sample, weights, n_frames, threads, cv2_threads)
+                for _ in range(workers)
+            ]
+            per_worker = [f.result() for f in futures]
+
+        results.append({
+            "workers": workers,
+            "torch_threads": threads,
+            "cv2_threads": cv2_threads,
+            "fps": round(sum(per_worker), 2),
+            "fps_per_worker": round(min(per_worker), 2),
+            "wall_s": round(time.perf_counter() - start, 1),
+        })
+        print(results[-1])
+
+    best = max(results, key=lambda r: r["fps"])
+    config = {
+        "workers": best["workers"],
+        "torch_threads": best["torch_threads"],
+        "cv2_threads": best["cv2_threads"],
+        "fps": best["fps"],
+        "single": tune_single(sample, weights, n_frames),
+        "tuned_at": datetime.now().isoformat(),
+        "sample": str(sample),
+        "results": results,
+    }
+    save_tuning(config, path)
+    return config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune threads and workers")
+    parser.add_argument("sample", help="short sample clip to benchmark on")
+    parser.add_argument("--weights", default="yolov8n.pt")
+    parser.add_argument("--frames", type=int, default=TUNE_FRAMES)
+    args = parser.parse_args()
+
+    best = tune(args.sample, args.weights, args.frames)
+    single = best["single"]
+    print(f"Best: {best['workers']} worker(s) x {best['torch_threads']} torch "
+          f"thread(s), cv2 {best['cv2_threads']} -> {best['fps']} FPS")
+    print(f"Single process: {single['torch_threads']} torch thread(s), cv2 "
+          f"{single['cv2_threads']}, queue {single['queue_size']} -> "
+          f"{single['fps']} FPS")
+    print(f"Saved to {TUNING_PATH}")
@@ -0,0 +1,157 @@
+import json
+
+import cv2
+import numpy as np
+
+# ======================================================
+# PER-CAMERA ZONE CONFIG
+# ======================================================
+# A zone config describes queue polygons and stop lines for one camera:
+#
+#   {
+#     "queues": [
+#       {"name": "north", "polygon": [[x, y], [x, y], [x, y], ...]}
+#     ],
+#     "stop_lines": [
+#       {"name": "north", "points": [[x1, y1], [x2, y2]], "extend": false}
+#     ]
+#   }
+#
+# Coordinates are processing-resolution pixels (see backend.resolution for
+# configs written in source or normalized coordinates). It is compiled once
+# into:
+#
+#   - a bitmask raster (bit i = queue zone i), so queue membership of every
+#     track centre is a single array lookup
+#   - a signed-distance field per stop line. Lines are straight, so the field
+#     is the closed-form affine a*x + b*y + c (no raster, no bounds issues for
+#     centres that fall outside the frame). It is positive on the side you
+#     reach by turning p1 -> p2 90 degrees clockwise on screen (below a
+#     left-to-right line). A crossing is prev < 0 <= current, counted within
+#     the segment only unless "extend" is set.
+
+MAX_QUEUE_ZONES = 32
+MAX_STOP_LINES = 32
+
+
+def load_zone_config(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+class ZoneMap:
+    """Compiled zone config at one processing resolution."""
+
+    def __init__(self, config, size):
+        queues = config.get("queues", [])
+        lines = config.get("stop_lines", [])
+        if len(queues) > MAX_QUEUE_ZONES:
+            raise ValueError(f"At most {MAX_QUEUE_ZONES} queue zones are supported")
+        if len(lines) > MAX_STOP_LINES:
+            raise ValueError(f"At most {MAX_STOP_LINES} stop lines are supported")
+
+        self.config = config
+        self.size = tuple(size)
+        self.queue_names = [q["name"] for q in queues]
+        self.line_names = [ln["name"] for ln in lines]
+
+        self._compile_queues(queues)
+        self._compile_lines(lines)
+
+    # ================= QUEUE RASTER =================
+    def _compile_queues(self, queues):
+        polygons = [np.array(q["polygon"], dtype=np.int32).reshape(-1, 2)
+                    for q in queues]
+
+        # Raster covers the frame and every polygon, so a polygon reaching
+        # past the frame edge still matches centres out there.
+        w, h = self.size
+        for poly in polygons:
+            w = max(w, int(poly[:, 0].max()) + 1)
+            h = max(h, int(poly[:, 1].max()) + 1)
+
+        self.raster = np.zeros((h, w), dtype=np.uint32)
+        scratch = np.zeros((h, w), dtype=np.uint8)
+        for i, poly in enumerate(polygons):
+            scratch[:] = 0
+            cv2.fillPoly(scratch, [poly], 1)
+            self.raster[scratch > 0] |= np.uint32(1 << i)
+
+    def membership(self, cx, cy):
+        """Queue-zone bitmask for each centre (0 outside every zone)."""
+        cx = np.asarray(cx)
+        cy = np.asarray(cy)
+        h, w = self.raster.shape
+
+        inside = (cx >= 0) & (cx < w) & (cy >= 0) & (cy < h)
+        out = np.zeros(cx.shape, dtype=np.uint32)
+        out[inside] = self.raster[cy[inside], cx[inside]]
+        return out
+
+    def queue_counts(self, bits):
+        """(in any zone, per-zone counts) for membership bitmasks."""
+        per_zone = [
+            int(np.count_nonzero(bits & np.uint32(1 << i)))
+            for i in range(len(self.queue_names))
+        ]
+        return int(np.count_nonzero(bits)), per_zone
+
+    # ================= STOP-LINE FIELDS =================
+    def _compile_lines(self, lines):
+        n = len(lines)
+        self.line_coef = np.zeros((n, 3), dtype=np.float64)
+        self.line_p1 = np.zeros((n, 2), dtype=np.float64)
+        self.line_dir = np.zeros((n, 2), dtype=np.float64)
+        self.line_extend = np.zeros(n, dtype=bool)
+
+        for i, line in enumerate(lines):
+            (x1, y1), (x2, y2) = line["points"]
+            dx, dy = float(x2 - x1), float(y2 - y1)
+            norm = np.hypot(dx, dy)
+            if norm == 0:
+                raise ValueError(f"Stop line {line['name']!r} has zero length")
+
+            self.line_coef[i] = (-dy / norm, dx / norm, (dy * x1 - dx * y1) / norm)
+            self.line_p1[i] = (x1, y1)
+            self.line_dir[i] = (dx, dy)
+            self.line_extend[i] = bool(line.get("extend", False))
+
+    def signed_distance(self, cx, cy):
+        """(n, lines) signed distance of each centre to each stop line."""
+        a, b, c = self.line_coef.T
+        return (np.asarray(cx, dtype=np.float64)[:, None] * a
+                + np.asarray(cy, dtype=np.float64)[:, None] * b + c)
+
+    def on_segment(self, cx, cy):
+        """(n, lines) whether each centre projects onto each line segment."""
+        px = np.asarray(cx, dtype=np.float64)[:, None] - self.line_p1[:, 0]
+        py = np.asarray(cy, dtype=np.float64)[:, None] - self.line_p1[:, 1]
+        dx, dy = self.line_dir.T
+        t = (px * dx + py * dy) / (dx * dx + dy * dy)
+        return self.line_extend | ((t >= 0) & (t <= 1))
+
+    def crossings(self, prev_cx, prev_cy, cx, cy):
+        """(n, lines) stop-line crossings between two centre positions."""
+        if not len(self.line_names):
+            return np.zeros((len(cx), 0), dtype=bool)
+
+        before = self.signed_distance(prev_cx, prev_cy)
+        after = self.signed_distance(cx, cy)
+        return (before < 0) & (0 <= after) & self.on_segment(cx, cy)
+
+    # ================= MOTION / DRAWING HELPERS =================
+    def regions(self, band=20):
+        """Bounding boxes of every queue zone and a band around each line."""
+        boxes = []
+        for q in self.config.get("queues", []):
+            poly = np.array(q["polygon"])
+            boxes.append((*poly.min(axis=0), *poly.max(axis=0)))
+        for line in self.config.get("stop_lines", []):
+            pts = np.array(line["points"])
+            lo, hi = pts.min(axis=0), pts.max(axis=0)
+            if line.get("extend"):
+                # stretch along the line's dominant axis to the frame edges
+                axis = 0 if hi[0] - lo[0] >= hi[1] - lo[1] else 1
+                lo[axis], hi[axis] = 0, self.size[axis]
+            boxes.append((lo[0] - band, lo[1] - band, hi[0] + band, hi[1] + band))
+        return [tuple(int(v) for v in box) for box in boxes]
@@ -1,12 +1,18 @@
 import streamlit as st
-import pandas as pd
 import matplotlib.pyplot as plt
 from datetime import datetime
 import os
+import time
 
-from backend.process_video import process_video
+from backend import cache
+from backend.ingest import ingest_stream
+from backend.run_store import load_metrics
+from backend.jobs import ACTIVE_STATES, JobQueue, WorkerPool, default_concurrency
 IS_CLOUD = os.getenv("STREAMLIT_CLOUD") is not None
 
+# Set TRAFFIC_JOB_WORKERS=external when `python -m backend.jobs` runs the workers
+EXTERNAL_WORKERS = os.getenv("TRAFFIC_JOB_WORKERS") == "external"
+
 # ==============================
 # SESSION STATE
 # ==============================
@@ -16,6 +22,12 @@ if "processed" not in st.session_state:
 if "df" not in st.session_state:
     st.session_state.df = None
 
+if "job_id" not in st.session_state:
+    st.session_state.job_id = None
+
+if "cached_run" not in st.session_state:
+    st.session_state.cached_run = None
+
 if "metrics" not in st.session_state:
     st.session_state.metrics = {
         "total_vehicles": 0,
@@ -88,6 +100,24 @@ NH-44 × RTC Junction · Kurnool · Smart City Analytics
 </div>
 """, unsafe_allow_html=True)
 
+# ==============================
+# BACKGROUND JOBS
+# ==============================
+jobs = JobQueue()
+
+
+@st.cache_resource
+def job_workers():
+    """One worker pool per server process, shared by every session."""
+    return WorkerPool(default_concurrency()).start()
+
+
+if not IS_CLOUD and not EXTERNAL_WORKERS:
+    job_workers()
+
+job = jobs.get(st.session_state.job_id) if st.session_state.job_id else None
+job_active = job is not None and job["state"] in ACTIVE_STATES
+
 # ==============================
 # SIDEBAR
 # ==============================
@@ -102,6 +132,13 @@ with st.sidebar:
 
     process_btn = st.button("▶ Process Video", use_container_width=True)
 
+    with st.expander("🗂 Job Queue"):
+        for j in jobs.list(limit=10):
+            pct = ""
+            if j["frames_total"]:
+                pct = f" · {100 * j['frames_done'] // j['frames_total']}%"
+            st.caption(f"#{j['id']} {os.path.basename(j['video_path'])} · {j['state']}{pct}")
+
     st.markdown("---")
     st.markdown("**AI Stack Used**")
     st.caption("• YOLOv8 Object Detection")
@@ -113,26 +150,12 @@ with st.sidebar:
 # ==============================
 # PROCESS VIDEO
 # ==============================
-if uploaded_video and process_btn and not st.session_state.processed:
-
-    os.makedirs("uploads", exist_ok=True)
-    video_path = f"uploads/{uploaded_video.name}"
-
-    with open(video_path, "wb") as f:
-        f.write(uploaded_video.getbuffer())
-
-    if IS_CLOUD:
-        st.warning(
-            "🚫 Live video processing is disabled on Streamlit Cloud.\n\n"
-            "👉 Please run the app locally to see real-time AI video analysis."
-        )
-    else:
-        with st.spinner("Processing video… please wait"):
-            run_dir = process_video(video_path)
+PLOT_COLUMNS = ["frame", "queue_count", "red_light_violations",
+                "rash_driving", "total_vehicles"]
 
 
-    csv_path = os.path.join(run_dir, "traffic_log.csv")
-    df = pd.read_csv(csv_path)
+def load_results(run_dir):
+    df = load_metrics(run_dir, PLOT_COLUMNS)
 
     st.session_state.df = df
 
@@ -145,8 +168,95 @@ if uploaded_video and process_btn and not st.session_state.processed:
     }
 
     st.session_state.processed = True
+
+
+if uploaded_video and process_btn and not job_active:
+
+    # Streamed to disk in chunks and hashed on the way; locally the job
+    # starts on the partial file as soon as it probes as a video.
+    uploaded_video.seek(0)
+    size = uploaded_video.size or 1
+    written = st.progress(0.0, text="Saving upload…")
+    probed = st.empty()
+
+    def start_job(ingest):
+        if ingest.meta:
+            m = ingest.meta
+            duration = f" · {m['duration_s']:.0f}s" if m["duration_s"] else ""
+            probed.caption(f"🎞 {m['width']}x{m['height']} @ {m['fps']:.1f} FPS{duration}")
+        if not IS_CLOUD:
+            st.session_state.job_id = jobs.submit(ingest.path)
+
+    def show_written(ingest):
+        written.progress(min(ingest.bytes / size, 1.0),
+                         text=f"Saving upload… {ingest.bytes // (1024 * 1024)} MB")
+
+    st.session_state.job_id = None
+    try:
+        ingest = ingest_stream(uploaded_video, uploaded_video.name,
+                               on_ready=start_job, on_progress=show_written)
+    except BaseException:
+        # Interrupted (e.g. a rerun from any widget click): the job started
+        # on the partial file must not finish as a successful run
+        if st.session_state.job_id:
+            jobs.cancel(st.session_state.job_id)
+        st.session_state.job_id = None
+        raise
+    written.empty()
+
+    # Re-uploads reuse the file and its cached run
+    _, cached_dir = cache.cached_run(ingest.final)
+
+    if cached_dir is not None:
+        if st.session_state.job_id:
+            jobs.cancel(st.session_state.job_id)
+        st.session_state.job_id = None
+        st.session_state.cached_run = cached_dir
+        job = None
+        load_results(cached_dir)
+    elif IS_CLOUD:
+        st.warning(
+            "🚫 Live video processing is disabled on Streamlit Cloud.\n\n"
+            "👉 Please run the app locally to see real-time AI video analysis."
+        )
+    else:
+        st.session_state.cached_run = None
+        st.session_state.processed = False
+        job = jobs.get(st.session_state.job_id)
+        job_active = True
+
+# ==============================
+# JOB PROGRESS (POLLED)
+# ==============================
+if job_active:
+    total, done = job["frames_total"], job["frames_done"]
+    label = f"Job #{job['id']} {job['state']}"
+    if total:
+        label += f" · {done}/{total} frames"
+    st.progress(min(done / total, 1.0) if total else 0.0, text=label)
+
+    if job["fps"]:
+        eta = f" · ETA {job['eta_s']:.0f}s" if job["eta_s"] is not None else ""
+        st.caption(f"⚙️ {job['fps']:.1f} FPS{eta}")
+
+    if st.button("✖ Cancel Job"):
+        jobs.cancel(job["id"])
+
+elif job is not None and job["state"] == "done" and not st.session_state.processed:
+    load_results(job["run_dir"])
     st.success("✅ Video processed successfully")
 
+elif st.session_state.cached_run and st.session_state.processed:
+    st.success(f"⚡ Loaded cached results from {st.session_state.cached_run}")
+
+elif job is not None and job["state"] == "failed":
+    st.error(f"❌ Job #{job['id']} failed")
+    with st.expander("Error details"):
+        st.code(job["error"])
+
+elif job is not None and job["state"] == "cancelled":
+    st.warning(f"Job #{job['id']} was cancelled")
+
 # ==============================
 # METRICS DASHBOARD
 # ==============================
@@ -205,3 +315,10 @@ st.markdown('</div>', unsafe_allow_html=True)
 st.caption(
     f"Urban Traffic Intelligence System | Generated {datetime.now().strftime('%d %b %Y · %I:%M %p')}"
 )
+
+# ==============================
+# POLL RUNNING JOB
+# ==============================
+if job_active:
+    time.sleep(1)
+    st.rerun()
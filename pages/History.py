@@ -1,10 +1,11 @@
 import streamlit as st
-import pandas as pd
 import json
 import os
 from datetime import datetime
 import matplotlib.pyplot as plt
 
+from backend.run_store import has_metrics, load_metrics
+
 # ==============================
 # PAGE CONFIG
 # ==============================
@@ -85,14 +86,15 @@ run_path = os.path.join(HISTORY_DIR, selected_run)
 summary_path = os.path.join(run_path, "summary.json")
 csv_path = os.path.join(run_path, "traffic_log.csv")
 
-if not os.path.exists(summary_path) or not os.path.exists(csv_path):
+if not os.path.exists(summary_path) or not (has_metrics(run_path) or os.path.exists(csv_path)):
     st.error("Run data incomplete.")
     st.stop()
 
 with open(summary_path) as f:
     summary = json.load(f)
 
-df = pd.read_csv(csv_path)
+# Only the plotted columns are read (memory-mapped for columnar runs)
+df = load_metrics(run_path, ["frame", "queue_count", "red_light_violations", "rash_driving"])
 
 # ==============================
 # SUMMARY CARDS
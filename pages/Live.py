@@ -4,6 +4,8 @@ import os
 import time
 from PIL import Image
 
+from backend.run_store import has_metrics, last_metrics
+
 # ==============================
 # PAGE CONFIG
 # ==============================
@@ -96,19 +98,31 @@ with right:
 
     # Default values
     vehicles = queue = violations = rash = 0
+    lag = dropped = None
 
     # Try reading latest history
     if os.path.exists("history"):
         runs = sorted(os.listdir("history"), reverse=True)
         if runs:
-            latest_run = os.path.join("history", runs[0], "traffic_log.csv")
-            if os.path.exists(latest_run):
-                df = pd.read_csv(latest_run)
-                last = df.iloc[-1]
-                vehicles = int(last["total_vehicles"])
-                queue = int(last["queue_count"])
-                violations = int(last["red_light_violations"])
-                rash = int(last["rash_driving"])
+            latest_run = os.path.join("history", runs[0])
+            if has_metrics(latest_run) or os.path.exists(
+                os.path.join(latest_run, "traffic_log.csv")
+            ):
+                # Only the newest row is read (memory-mapped for columnar runs)
+                last = last_metrics(latest_run, [
+                    "total_vehicles", "queue_count", "red_light_violations",
+                    "rash_driving", "dropped_frames", "lag_ms",
+                ])
+                if last:
+                    vehicles = int(last["total_vehicles"])
+                    queue = int(last["queue_count"])
+                    violations = int(last["red_light_violations"])
+                    rash = int(last["rash_driving"])
+
+                    # Real-time runs also log stream lag and dropped frames
+                    if "lag_ms" in last:
+                        lag = last["lag_ms"]
+                        dropped = int(last["dropped_frames"])
 
     def stat(label, value, emoji):
         st.markdown(f"""
@@ -123,6 +137,9 @@ with right:
     stat("Red-Light", violations, "🚨")
     stat("Rash Driving", rash, "⚠️")
 
+    if lag is not None and pd.notna(lag):
+        st.caption(f"⏱ Lag: {lag:.0f} ms · Dropped frames: {dropped}")
+
 # ==============================
 # AUTO REFRESH
 # ==============================
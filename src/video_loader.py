@@ -1,27 +1,239 @@
+import os
+import time
+from collections import namedtuple
+
 import cv2
 
-video_path = "data/sample_video.mp4"
+# ======================================================
+# FRAME SOURCE
+# ======================================================
+# One iterator for video files, image directories and live capture URLs.
+# Frames that are not sampled are only grab()bed (no decode to BGR, no copy);
+# retrieve() runs for kept frames only. Sampling is either every Nth frame
+# (`frame_skip`, same frames as the old `raw_frame_id % FRAME_SKIP` loop) or
+# by time (`target_fps`).
+#
+# A file that is still being written can be followed: with `follow` set, EOF
+# calls `follow()` and, while it returns True, waits, reopens the file and
+# resumes after the last frame read; once it returns False one last pass
+# picks up whatever the writer added before finishing.
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+LIVE_PREFIXES = ("rtsp://", "rtmp://", "http://", "https://", "udp://", "tcp://")
+FOLLOW_POLL_S = 0.25
+
+SourceFrame = namedtuple(
+    "SourceFrame", ["index", "timestamp", "image", "native"], defaults=[None]
+)
+
+
+def is_live_source(source):
+    if isinstance(source, int):
+        return True
+    source = str(source)
+    return source.isdigit() or source.lower().startswith(LIVE_PREFIXES)
+
+
+class FrameSource:
+    """Sampled frames from a file, image directory or live capture.
+
+    Yields `SourceFrame(index, timestamp, image)` where `index` is the raw
+    0-based frame number and `timestamp` is seconds from the start of the
+    source (wall-clock seconds since opening for live captures). With
+    `keep_native=True` the un-resized image is also carried as `native`.
+    `transform(image)` replaces the plain resize to `size` (e.g. a letterbox).
+    `follow()` says whether a video file is still growing (see above).
+    """
+
+    def __init__(self, source, frame_skip=1, target_fps=None, size=None,
+                 start=0, image_fps=25.0, keep_native=False, transform=None,
+                 follow=None):
+        self.source = source
+        self.frame_skip = max(1, int(frame_skip))
+        self.target_fps = target_fps
+        self.size = size
+        self.start = start
+        self.keep_native = keep_native
+        self.transform = transform
+        self.follow = follow
+
+        self._cap = None
+        self._images = None
+        self._next_due = None
+
+        if not isinstance(source, int) and os.path.isdir(str(source)):
+            self.kind = "images"
+            self._images = sorted(
+                os.path.join(source, name)
+                for name in os.listdir(source)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            self.fps = float(image_fps)
+        else:
+            self.kind = "live" if is_live_source(source) else "file"
+            capture = int(source) if str(source).isdigit() else source
+            self._cap = cv2.VideoCapture(capture)
+            if not self._cap.isOpened():
+                raise IOError(f"Cannot open video source: {source}")
+            self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 0.0
+            if start and self.kind == "file":
+                self._cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    # ================= METADATA =================
+    @property
+    def frame_count(self):
+        """Total raw frames, or None for live sources."""
+        if self.kind == "images":
+            return len(self._images)
+        if self.kind == "live":
+            return None
+        return int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    @property
+    def resolution(self):
+        if self.kind == "images":
+            if not self._images:
+                return (0, 0)
+            h, w = cv2.imread(self._images[0]).shape[:2]
+            return (w, h)
+        return (
+            int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        )
+
+    # ================= SAMPLING =================
+    def _keep(self, index, timestamp):
+        if self.target_fps is None:
+            return (index + 1) % self.frame_skip == 0
+
+        period = 1.0 / self.target_fps
+        if self._next_due is not None and timestamp + 1e-6 < self._next_due:
+            return False
+
+        due = timestamp if self._next_due is None else self._next_due
+        self._next_due = due + period
+        if self._next_due <= timestamp:
+            self._next_due = timestamp + period     # fell behind: resync
+        return True
+
+    def _timestamp(self, index, opened_at):
+        if self.kind == "live":
+            return time.monotonic() - opened_at
+        if self.fps > 0:
+            return index / self.fps
+        return self._cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+
+    def _frame(self, index, timestamp, image):
+        native = image if self.keep_native else None
+        if self.transform is not None:
+            image = self.transform(image)
+        elif self.size is not None:
+            image = cv2.resize(image, self.size)
+        return SourceFrame(index, timestamp, image, native)
+
+    # ================= ITERATION =================
+    def __iter__(self):
+        if self.kind == "images":
+            yield from self._iter_images()
+        else:
+            yield from self._iter_capture()
+
+    def _iter_images(self):
+        for index in range(self.start, len(self._images)):
+            timestamp = index / self.fps
+            if not self._keep(index, timestamp):
+                continue
+
+            image = cv2.imread(self._images[index])
+            if image is None:
+                continue
+            yield self._frame(index, timestamp, image)
+
+    def _iter_capture(self):
+        opened_at = time.monotonic()
+        index = self.start if self.kind == "file" else 0
+        follow = self.follow if self.kind == "file" else None
+
+        # While following, a kept frame is held back until the next one can
+        # be grabbed: the last frame before EOF may be only partly written.
+        held = None
+        retry = None
+
+        while True:
+            while self._cap.grab():
+                if held is not None:
+                    yield self._frame(*held)
+                    held = None
+
+                timestamp = self._timestamp(index, opened_at)
+                if index == retry or self._keep(index, timestamp):
+                    retry = None
+                    ret, image = self._cap.retrieve()
+                    if not ret:
+                        retry = index
+                        break
+                    if follow is None:
+                        yield self._frame(index, timestamp, image)
+                    else:
+                        held = (index, timestamp, image)
+                index += 1
+
+            if follow is None:
+                break
+            if follow():
+                if held is not None:
+                    index = retry = held[0]     # read it again once complete
+                    held = None
+                time.sleep(FOLLOW_POLL_S)
+            else:
+                follow = None           # writer done: one last pass
+            if not self._reopen(index):
+                break
+
+        if held is not None:
+            yield self._frame(*held)
+
+    def _reopen(self, index):
+        """Reopen a growing file positioned at raw frame `index`."""
+        self._cap.release()
+        self._cap = cv2.VideoCapture(self.source)
+        if not self._cap.isOpened():
+            return False
+        if index:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        return True
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
 
-cap = cv2.VideoCapture(video_path)
 
-if not cap.isOpened():
-    print("Error: Cannot open video file")
-    exit()
+if __name__ == "__main__":
+    video_path = "data/sample_video.mp4"
 
-print("Playing video... Press 'q' to quit.")
+    try:
+        source = FrameSource(video_path)
+    except IOError:
+        print("Error: Cannot open video file")
+        exit()
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        print("End of video")
-        break
+    print("Playing video... Press 'q' to quit.")
 
-    cv2.imshow("Video Playback", frame)
+    with source:
+        for frame in source:
+            cv2.imshow("Video Playback", frame.image)
 
-    # waitKey(25) controls playback speed (25 ms ~ 40 FPS)
-    if cv2.waitKey(25) & 0xFF == ord('q'):
-        print("Stopped by user")
-        break
+            # waitKey(25) controls playback speed (25 ms ~ 40 FPS)
+            if cv2.waitKey(25) & 0xFF == ord('q'):
+                print("Stopped by user")
+                break
+        else:
+            print("End of video")
 
-cap.release()
-cv2.destroyAllWindows()
+    cv2.destroyAllWindows()